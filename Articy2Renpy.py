@@ -1,300 +1,341 @@
-import argparse
-import json
-
-from ArticyCoreClass import ArticyCore
-from ArticyCoreClass import Character
-from ArticyCoreClass import FlowFrag
-from ArticyCoreClass import Episode
-from ArticyCoreClass import Scene
-from ArticyCoreClass import Dialog
-from ArticyCoreClass import Condition
-from ArticyCoreClass import Instruction
-from ArticyCoreClass import Snippet
-from ArticyCoreClass import Code
-from ArticyCoreClass import Game
-from ArticyCoreClass import Hub
-
-parser = argparse.ArgumentParser(description='Convert the JSON file from Articy to a Renpy file')
-parser.add_argument('-i', required=True, help='JSON file created by Articy (required)')
-parser.add_argument('-o', required=False, help='Renpy file created from the JSON file')
-
-args = parser.parse_args()
-
-#print(args)
-#print(args.i)
-
-#-------------------------------------------------------------------------------
-f = open(args.i)
-data = json.load(f)
-f.close()
-
-TheGame: Game = None
-Characters = []
-FlowFrags = []
-Episodes = []
-Scenes = []
-Dialogs = []
-Conditions = []
-Snippets = []
-Codes = []
-Instructions = []
-Hubs = []
-
-#-------------------------------------------------------------------------------
-# parse the JSON file, building up internal data structures
-
-for package in data['Packages']:
-    for model in package['Models']:
-        if model['Type']=='DialogueFragment':
-            properties = model['Properties']
-            outputpins = properties['OutputPins']
-            outputs = []
-            for outputpin in outputpins:
-                connections = outputpin['Connections']
-                for connection in connections:
-                    outputs.append(connection['Target'])
-            dialog = Dialog(properties['Id'], properties['Parent'], properties['MenuText'], properties['StageDirections'], properties['Speaker'], properties['Text'], outputs)
-            Dialogs.append(dialog)
-
-        elif model['Type']=='Instruction':
-            properties = model['Properties']
-            outputpins = properties['OutputPins']
-            outputs = []
-            for outputpin in outputpins:
-                connections = outputpin['Connections']
-                for connection in connections:
-                    outputs.append(connection['Target'])
-            frag = FlowFrag(properties['Id'], properties['DisplayName'], properties['Parent'], properties['Text'], outputs)
-            instruction = Instruction(frag, properties['Expression'])
-            Instructions.append(instruction)
-
-        elif model['Type']=='Condition':
-            properties = model['Properties']
-            outputpins = properties['OutputPins']
-            outputs = []
-            for outputpin in outputpins:
-                connections = outputpin['Connections']
-                for connection in connections:
-                    outputs.append(connection['Target'])
-            frag = FlowFrag(properties['Id'], properties['DisplayName'], properties['Parent'], properties['Text'], outputs)
-            condition = Condition(frag, properties['Expression'])
-            Conditions.append(condition)
-
-        elif model['Type']=='Hub':
-            properties = model['Properties']
-            outputpins = properties['OutputPins']
-            outputs = []
-            for outputpin in outputpins:
-                connections = outputpin['Connections']
-                for connection in connections:
-                    outputs.append(connection['Target'])
-            frag = FlowFrag(properties['Id'], properties['DisplayName'], properties['Parent'], properties['Text'], outputs)
-            hub = Hub(frag, "hub")
-            Hubs.append(hub)
-
-        elif model['Type']=='DefaultMainCharacterTemplate_02':
-            properties = model['Properties']
-            color = properties['Color']
-            template = model['Template']
-            basic = template['DefaultBasicCharacterFeature_02']
-            colorR = round(255*color['r'])
-            colorG = round(255*color['g'])
-            colorB = round(255*color['b'])
-            char = Character(properties['Id'], properties['DisplayName'], (colorR, colorG, colorB), basic['AbreviatedName'])
-            Characters.append(char)
-
-        elif (model['Type']=='FlowFragment') or (model['Type']=='Dialogue'):
-            properties = model['Properties']
-            outputpins = properties['OutputPins']
-            outputs = []
-            for outputpin in outputpins:
-                if 'Connections' in outputpin:
-                    connections = outputpin['Connections']
-                    for connection in connections:
-                        outputs.append(connection['Target'])
-            frag = FlowFrag(properties['Id'], properties['DisplayName'], properties['Parent'], properties['Text'], outputs)
-            FlowFrags.append(frag)
-        
-            names = frag.Name.split()
-            if names[0].lower()[:7] == 'episode':
-                episode = Episode(frag)
-                Episodes.append(episode)
-            elif names[0].lower()[:5] == 'scene':
-                scene = Scene(frag)
-                Scenes.append(scene)
-            elif names[0].lower()[:7] == 'snippet':
-                scene = Snippet(frag)
-                Snippets.append(scene)
-            elif names[0].lower()[:4] == 'code':
-                scene = Code(frag)
-                Codes.append(scene)
-            elif names[0].lower()[:4] == 'game':
-                TheGame = Game(frag)
-
-        else:
-            print('Unhandled ???')
-            print(model['Type'])
-            print()
-
-#-------------------------------------------------------------------------------
-# For debug purposes, print out the data structures created from parsing the JSON file
-
-print('Characters:')
-Characters.sort(key=lambda character: character.Name)
-for char in Characters:
-    print(char)
-
-print()
-
-print('FlowFrags:')
-for frag in FlowFrags:
-    print(frag)
-
-print()
-
-print('Game:')
-print(TheGame)
-
-print()
-
-print('Episodes:')
-Episodes.sort(key=lambda episode: episode.Num)
-for episode in Episodes:
-    print(episode)
-
-print()
-
-print('Scenes:')
-Scenes.sort(key=lambda scene: scene.Num)
-for scene in Scenes:
-    print(scene)
-
-print()
-
-print('Snippets:')
-Snippets.sort(key=lambda snippet: snippet.Num)
-for snippet in Snippets:
-    print(snippet)
-
-print()
-
-print('Dialogs:')
-for dialog in Dialogs:
-#    if dialog.StageDirections == 'aurora smirks':
-    if dialog.StageDirections == 'art sad':
-        debug = 1
-    dialog.MakeConnections(Scenes, Characters, Dialogs, Conditions, Instructions, Codes, Snippets, Hubs)
-for dialog in Dialogs:
-    print(dialog)
-
-print()
-
-def Connections(name, clist: []):
-    print(name+":")
-    for citem in clist:
-        citem.MakeConnections(Scenes, Dialogs, Conditions, Instructions, Codes, Snippets, Hubs)
-        print(citem)
-    print()
-
-Connections('Conditions', Conditions)
-Connections('Instructions', Instructions)
-Connections('Code Blocks', Codes)
-Connections('Snippets', Snippets)
-Connections('Hubs', Hubs)
-
-#-------------------------------------------------------------------------------
-# Now translate the structures into a Ren'Py representation
-
-TheGame.MakeLinkages(Episodes)
-print(TheGame.Title())
-episode = TheGame.First
-while episode != None:
-    print('  ', episode.Title())
-    episode.MakeLinkages(Scenes)
-    scene = episode.First
-    while scene != None:
-        print('    ', f"({scene.Prefix()})", scene.Title())
-        scene = scene.Next()
-
-    print()
-    episode = episode.Next()
-
-print()
-
-for scene in Scenes:
-    scene.PrepareDialog(Dialogs, Snippets, Conditions, Instructions, Codes)
-    lines = scene.CreateRenpyScene()
-    if len(lines) > 0:
-        print(f"({scene.Prefix()}) {scene.Title()}")
-        print()
-        for line in lines:
-            print(line)
-        print()
-
-for snippet in Snippets:
-    snippet.PrepareDialog(Dialogs, Snippets, Conditions, Instructions, Codes)
-    lines = snippet.CreateRenpyScene()
-    if len(lines) > 0:
-        print(f"({snippet.Prefix()}) {snippet.Title()}")
-        print()
-        for line in lines:
-            print(line)
-        print()
-
-for scene in Scenes:
-    if len(scene.Images) > 0:
-        print(f"({scene.Prefix()}) {scene.Title()}")
-        for imagename in scene.Images:
-            print(imagename)
-    print()
-
-for snippet in Snippets:
-    if len(snippet.Images) > 0:
-        print(f"({snippet.Prefix()}) {snippet.Title()}")
-        for imagename in snippet.Images:
-            print(imagename)
-    print()
-
-print()
-
-#-------------------------------------------------------------------------------
-# write Rnpy code out to the specified file
-
-if args.o != None:
-    f = open(args.o, "w")
-
-    # The code files
-
-    for scene in Scenes:
-        lines = scene.CreateRenpyScene()
-        if len(lines) > 0:
-            for line in lines:
-                f.write(f"{line}\n")
-            f.write("\n")
-
-    for snippet in Snippets:
-        lines = snippet.CreateRenpyScene()
-        if len(lines) > 0:
-            for line in lines:
-                f.write(f"{line}\n")
-            f.write("\n")
-
-    # List out the images needed
-
-    for scene in Scenes:
-        if len(scene.Images) > 0:
-            for imagename in scene.Images:
-                f.write(f"{imagename}\n")
-        f.write("\n")
-
-    for snippet in Snippets:
-        if len(snippet.Images) > 0:
-            for imagename in snippet.Images:
-                f.write(f"{imagename}\n")
-        f.write("\n")
-
-    f.close()
-
-
-
-
+import argparse
+import os
+import tracemalloc
+
+from ArticyProject import Convert
+from ArticyCoreClass import FollowNext
+from ArticyValidate import ValidationError
+from ArticyValidate import CountErrors
+from ArticyPrune import PRUNED_LISTS
+from ArticySelect import Selection
+from ArticyOutput import WriteSceneFiles
+from ArticyOutput import WriteIfChanged
+from ArticyOutput import WriteAtomic
+from ArticyOutput import ImageStubs
+from ArticyCache import SceneCache
+from ArticyCache import DEFAULT_CACHE_SIZE
+from ArticyProfile import Profiler
+from ArticyWatch import WatchFile
+from ArticyBatch import ExpandInputs
+from ArticyBatch import PlanBatch
+from ArticyBatch import ConvertBatch
+from ArticyBatch import PrintBatchSummary
+from ArticyWatch import POLL_INTERVAL
+from ArticyWatch import DEBOUNCE_TIME
+
+# JSON files of a batch converted at once
+BATCH_THREADS = 4
+
+# the debug sections which can be printed to the console
+DEBUG_SECTIONS = ['unhandled', 'characters', 'flowfrags', 'game', 'episodes', 'scenes', 'snippets', 'dialogs', 'connections', 'outline', 'renpy', 'images']
+
+parser = argparse.ArgumentParser(description='Convert the JSON file from Articy to a Renpy file')
+parser.add_argument('-i', required=True, nargs='+', help='JSON file created by Articy (required), or several files or directories of them to convert as a batch')
+parser.add_argument('-o', required=False, help='Renpy file created from the JSON file (in a batch, the directory for a NAME.rpy per JSON file)')
+parser.add_argument('-d', '--outdir', help='directory to write one Renpy file per scene and snippet into, unchanged files are left alone (in a batch, a NAME subdirectory per JSON file)')
+parser.add_argument('--image-stubs', help='Renpy file declaring a placeholder for every image the scenes need, each image once (in a batch, the directory for a NAME_images.rpy per JSON file)')
+parser.add_argument('-t', '--threads', type=int, default=BATCH_THREADS, help=f'number of JSON files of a batch converted at the same time (default {BATCH_THREADS})')
+parser.add_argument('-s', '--stream', action='store_true', help='read the JSON file one model at a time to reduce peak memory')
+parser.add_argument('-j', '--jobs', type=int, default=1, help='number of processes generating the scenes (default 1)')
+parser.add_argument('-c', '--cache', help='file caching the generated scenes between runs, only changed scenes are regenerated')
+parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help=f'most scenes kept in the cache (default {DEFAULT_CACHE_SIZE})')
+parser.add_argument('--snapshot', help='file keeping the parsed and linked structures, reused while the JSON file is unchanged')
+parser.add_argument('-w', '--watch', action='store_true', help='keep running, converting the JSON file again each time it changes (stop with Ctrl+C)')
+parser.add_argument('--poll', type=float, default=POLL_INTERVAL, help=f'seconds between checks of the JSON file with --watch (default {POLL_INTERVAL})')
+parser.add_argument('--debounce', type=float, default=DEBOUNCE_TIME, help=f'seconds the JSON file must stay unchanged before it is converted with --watch (default {DEBOUNCE_TIME})')
+parser.add_argument('--profile', help='JSON file to write the time and peak memory of each phase, and the time taken by each scene, into')
+parser.add_argument('--memory', action='store_true', help='report the peak memory used by the conversion')
+parser.add_argument('--prune', action='store_true', help='drop the episodes, scenes, snippets and nodes the game cannot reach before generating')
+parser.add_argument('--episode', type=int, action='append', help='only convert this episode (by number), may be repeated')
+parser.add_argument('--scene', action='append', help='only convert this scene (by prefix, e.g. ep3sc05), may be repeated')
+parser.add_argument('--id', action='append', help='only convert the episode, scene or snippet with this Articy ID, may be repeated')
+parser.add_argument('--validate', action='store_true', help='check the JSON file for cycles, unresolved outputs, orphaned dialogs and scenes, and menus missing MenuText before converting it; stop if it cannot be converted')
+parser.add_argument('-q', '--quiet', action='store_true', help='skip all debug output (the default when -o or -d is given)')
+parser.add_argument('--debug', action='append', choices=DEBUG_SECTIONS+['all'], metavar='SECTION',
+                    help='print a debug section, may be repeated: '+', '.join(DEBUG_SECTIONS)+' or all (all sections are printed when neither -o nor -d is given)')
+
+def Debug(section):
+    return section in DebugSections
+
+def PrintProblems(path, problems: []):
+    for severity, message in problems:
+        print(f"{severity}: {message}")
+    errors = CountErrors(problems)
+    print(f"{path}: {errors} errors, {len(problems)-errors} warnings")
+
+def PrintConnections(name, clist: []):
+    print(name+":")
+    for citem in clist:
+        print(citem)
+    print()
+
+#-------------------------------------------------------------------------------
+# One conversion of the JSON file, run once or each time the file changes with --watch
+
+def RunConversion(args, cache: SceneCache = None):
+    #-------------------------------------------------------------------------------
+    if args.memory:
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+    profiler = None
+    if args.profile != None:
+        profiler = Profiler()
+
+    selection = None
+    if args.episode != None or args.scene != None or args.id != None:
+        # only the selected scenes and snippets, and the snippets they call, are parsed
+        selection = Selection(args.episode, args.scene, args.id)
+
+    # the project is loaded, linked, validated and pruned here, and generated below once the debug sections are printed
+    try:
+        project = Convert(args.i, args.stream, args.jobs, cache, args.snapshot, profiler, selection, args.validate, args.prune, generate=False)
+    except ValidationError as error:
+        PrintProblems(args.i, error.Problems)
+        raise Exception(f"{args.i} cannot be converted, see the errors above") from None
+
+    if Debug('unhandled') and len(project.Unhandled) > 0:
+        print('Unhandled:')
+        for modeltype, count in project.Unhandled.most_common():
+            print(f"{modeltype}: {count}")
+        print()
+
+    if args.validate:
+        PrintProblems(args.i, project.Problems)
+
+    if args.prune:
+        counts = project.PruneCounts
+        kept = sum(counts[name][0] for name in PRUNED_LISTS)
+        dropped = sum(counts[name][1] for name in PRUNED_LISTS)
+        pruned = ", ".join(f"{counts[name][1]} {name.lower()}" for name in PRUNED_LISTS if counts[name][1] > 0)
+        print(f"{args.i}: pruned {dropped} of {kept+dropped} nodes the game cannot reach" + (f" ({pruned})" if dropped > 0 else ""))
+
+    TheGame = project.TheGame
+    Characters = project.Characters
+    FlowFrags = project.FlowFrags
+    Episodes = project.Episodes
+    Scenes = project.Scenes
+    Dialogs = project.Dialogs
+    Conditions = project.Conditions
+    Snippets = project.Snippets
+    Codes = project.Codes
+    Instructions = project.Instructions
+    Hubs = project.Hubs
+
+    if args.memory:
+        # everything still allocated at this point is the linked model
+        nodecount = project.NodeCount()
+        modelsize = tracemalloc.get_traced_memory()[0]-baseline
+
+    #-------------------------------------------------------------------------------
+    # For debug purposes, print out the data structures created from parsing the JSON file
+
+    if Debug('characters'):
+        print('Characters:')
+        for char in Characters:
+            print(char)
+
+        print()
+
+    if Debug('flowfrags'):
+        print('FlowFrags:')
+        for frag in FlowFrags:
+            print(frag)
+
+        print()
+
+    if Debug('game'):
+        print('Game:')
+        print(TheGame)
+
+        print()
+
+    if Debug('episodes'):
+        print('Episodes:')
+        for episode in Episodes:
+            print(episode)
+
+        print()
+
+    if Debug('scenes'):
+        print('Scenes:')
+        for scene in Scenes:
+            print(scene)
+
+        print()
+
+    if Debug('snippets'):
+        print('Snippets:')
+        for snippet in Snippets:
+            print(snippet)
+
+        print()
+
+    if Debug('dialogs'):
+        print('Dialogs:')
+        for dialog in Dialogs:
+            print(dialog)
+
+        print()
+
+    if Debug('connections'):
+        PrintConnections('Conditions', Conditions)
+        PrintConnections('Instructions', Instructions)
+        PrintConnections('Code Blocks', Codes)
+        PrintConnections('Snippets', Snippets)
+        PrintConnections('Hubs', Hubs)
+
+    if Debug('outline'):
+        print(TheGame.Title())
+        for episode in FollowNext(TheGame.First):
+            print('  ', episode.Title())
+            for scene in FollowNext(episode.First):
+                print('    ', f"({scene.Prefix()})", scene.Title())
+
+            print()
+
+        print()
+
+    #-------------------------------------------------------------------------------
+    # Now translate the structures into a Ren'Py representation
+
+    # generate each scene and snippet once, the preview and the output file both use the lines kept on it
+    # when only the output file needs them, the scenes are generated as they are written instead, without keeping their lines
+
+    streamOutput = args.o != None and args.outdir == None and cache == None and args.jobs <= 1 and not Debug('renpy') and not Debug('images')
+
+    if not streamOutput:
+        project.Generate(args.jobs, cache)
+
+    if cache != None:
+        cache.Save()
+        print(f"{args.cache if args.cache != None else 'Scenes'}: {cache.Hits} scenes reused, {cache.Misses} generated")
+
+    if Debug('renpy'):
+        for scene in Scenes:
+            if len(scene.Lines) > 0:
+                print(f"({scene.Prefix()}) {scene.Title()}")
+                print()
+                for line in scene.Lines:
+                    print(line)
+                print()
+
+        for snippet in Snippets:
+            if len(snippet.Lines) > 0:
+                print(f"({snippet.Prefix()}) {snippet.Title()}")
+                print()
+                for line in snippet.Lines:
+                    print(line)
+                print()
+
+    if Debug('images'):
+        for scene in Scenes:
+            if len(scene.Images) > 0:
+                print(f"({scene.Prefix()}) {scene.Title()}")
+                for imagename in scene.Images:
+                    print(imagename)
+            print()
+
+        for snippet in Snippets:
+            if len(snippet.Images) > 0:
+                print(f"({snippet.Prefix()}) {snippet.Title()}")
+                for imagename in snippet.Images:
+                    print(imagename)
+            print()
+
+        print()
+
+    #-------------------------------------------------------------------------------
+    # write Rnpy code out to the specified file
+
+    # when streamed, the scenes are generated as they are written, and their time is reported as a 'generate' phase of its own
+    if args.o != None:
+        with project.Profiler.Phase('write'):
+            WriteAtomic(args.o, project.StreamRenpyChunks() if streamOutput else project.RenpyChunks(), skipunchanged=True)
+
+    if args.outdir != None:
+        with project.Profiler.Phase('write scene files'):
+            # the files of the scenes left out of a selection are kept
+            written, skipped, removed = WriteSceneFiles(args.outdir, Scenes+Snippets, removestale=selection == None)
+        print(f"{args.outdir}: {written} files written, {skipped} unchanged files skipped, {removed} files of scenes no longer in the export removed")
+
+    if args.image_stubs != None:
+        WriteIfChanged(args.image_stubs, ImageStubs(project.Images()))
+
+    if profiler != None:
+        profiler.Save(args.profile)
+
+    if args.memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if profiler != None:
+            # the profiler resets the peak at the start of each phase
+            peak = max(peak, profiler.Peak)
+        tracemalloc.stop()
+        print(f"Peak memory: {peak/(1024*1024):.1f} MiB (still in use at the end: {current/(1024*1024):.1f} MiB)")
+        print(f"Linked model: {modelsize/(1024*1024):.1f} MiB for {nodecount} nodes, {modelsize/max(nodecount, 1):.0f} bytes per node")
+
+#-------------------------------------------------------------------------------
+# The conversion only runs as a script, so the processes used by --jobs can import this file safely
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    # several files, or a directory, are converted as a batch
+    batch = len(args.i) > 1 or os.path.isdir(args.i[0])
+    if batch:
+        if args.watch or args.snapshot != None or args.profile != None or args.memory or args.debug != None:
+            parser.error("--watch, --snapshot, --profile, --memory and --debug need a single JSON file")
+        if args.episode != None or args.scene != None or args.id != None:
+            parser.error("--episode, --scene and --id need a single JSON file")
+        if args.jobs > 1 and args.threads > 1:
+            # each thread would fork its pool of processes while the other threads are running, which can deadlock
+            parser.error("-j needs -t 1 in a batch")
+    else:
+        args.i = args.i[0]
+
+    if args.snapshot != None and (args.episode != None or args.scene != None or args.id != None):
+        # a snapshot keeps the whole export
+        parser.error("--snapshot cannot be used with --episode, --scene or --id")
+
+    if args.debug != None:
+        DebugSections = set(args.debug)
+        if 'all' in DebugSections:
+            DebugSections = set(DEBUG_SECTIONS)
+    elif args.quiet or args.o != None or args.outdir != None:
+        DebugSections = set()
+    else:
+        DebugSections = set(DEBUG_SECTIONS)
+
+    #print(args)
+    #print(args.i)
+
+    cache = None
+    if args.cache != None:
+        # reuse the lines of every scene whose subgraph has not changed since the last run
+        cache = SceneCache(args.cache, args.cache_size)
+        cache.Load()
+    elif args.watch:
+        # the scenes are still only regenerated when they change, the cache is kept in memory without -c
+        cache = SceneCache(None, args.cache_size)
+
+    if batch:
+        files = PlanBatch(ExpandInputs(args.i), args.o, args.outdir, args.image_stubs)
+        if len(files) == 0:
+            parser.error("no JSON files found in "+", ".join(args.i))
+        ConvertBatch(files, args.threads, args.stream, args.jobs, cache, args.prune, args.validate)
+        if cache != None:
+            cache.Save()
+            print(f"{args.cache}: {cache.Hits} scenes reused, {cache.Misses} generated")
+        if PrintBatchSummary(files) > 0:
+            exit(1)
+
+    elif args.watch:
+        def Reconvert():
+            # the warm process keeps the cache in memory, and only the outputs which changed are rewritten
+            cache.StartRun()
+            RunConversion(args, cache)
+
+        # the first conversion is made by the watch too, so a broken file at the start is reported rather than stopping it
+        WatchFile(args.i, Reconvert, args.poll, args.debounce)
+    else:
+        RunConversion(args, cache)
@@ -0,0 +1,121 @@
+import glob
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ArticyProject import Convert
+from ArticyOutput import WriteAtomic
+from ArticyOutput import WriteIfChanged
+from ArticyOutput import WriteSceneFiles
+from ArticyOutput import ImageStubs
+from ArticyValidate import ValidationError
+
+# --------------------------------------
+
+class BatchFile:
+    """One JSON file of a batch, where its outputs go and how its conversion went"""
+
+    def __init__(self, path, o=None, outdir=None, imagestubs=None):
+        self.Path = path
+        self.O = o
+        self.OutDir = outdir
+        self.ImageStubs = imagestubs
+        self.Seconds = 0
+        self.Nodes = 0
+        self.Scenes = 0
+        self.Pruned = 0  # nodes dropped by --prune
+        self.Problems = []  # (severity, message) found by --validate
+        self.Error = None
+
+# --------------------------------------
+
+def ExpandInputs(inputs: []):
+    """The JSON files named by inputs, a directory standing for the .json files directly inside it"""
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths.extend(sorted(glob.glob(os.path.join(path, '*.json'))))
+        else:
+            paths.append(path)
+    return paths
+
+def PlanBatch(paths: [], o=None, outdir=None, imagestubs=None):
+    """A BatchFile for each path, with -o, -d and --image-stubs taken as directories holding an output for each file
+
+    Each file's outputs are named after it: o/name.rpy, outdir/name/ and imagestubs/name_images.rpy.
+    Files with the same name in different directories get _2, _3, ... added."""
+    files = []
+    used = set()
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        unique = name
+        count = 1
+        while unique in used:
+            count += 1
+            unique = f"{name}_{count}"
+        used.add(unique)
+
+        files.append(BatchFile(path,
+                               os.path.join(o, unique+".rpy") if o != None else None,
+                               os.path.join(outdir, unique) if outdir != None else None,
+                               os.path.join(imagestubs, unique+"_images.rpy") if imagestubs != None else None))
+    return files
+
+def ConvertFile(batchfile: BatchFile, stream=False, jobs=1, cache=None, prune=False, validate=False):
+    # convert one file of the batch, any error is kept on it rather than stopping the others
+    start = time.perf_counter()
+    try:
+        for path in (batchfile.O, batchfile.ImageStubs):
+            if path != None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # the output file alone is generated as it is written, without keeping the lines
+        streamOutput = batchfile.O != None and batchfile.OutDir == None and cache == None and jobs <= 1
+        # generated here rather than by Convert, so the warnings of the validation are kept if the generation fails
+        project = Convert(batchfile.Path, stream, jobs, cache, validate=validate, prune=prune, generate=False)
+        batchfile.Problems = project.Problems
+        batchfile.Pruned = sum(dropped for kept, dropped in project.PruneCounts.values())
+        batchfile.Nodes = project.NodeCount()
+        batchfile.Scenes = len(project.Scenes)+len(project.Snippets)
+
+        if streamOutput:
+            WriteAtomic(batchfile.O, project.StreamRenpyChunks(), skipunchanged=True)
+        else:
+            project.Generate(jobs, cache)
+            if batchfile.O != None:
+                WriteAtomic(batchfile.O, project.RenpyChunks(), skipunchanged=True)
+            if batchfile.OutDir != None:
+                WriteSceneFiles(batchfile.OutDir, project.Scenes+project.Snippets)
+        if batchfile.ImageStubs != None:
+            WriteIfChanged(batchfile.ImageStubs, ImageStubs(project.Images()))
+    except ValidationError as error:
+        batchfile.Problems = error.Problems
+        batchfile.Error = f"cannot be converted, {error}"
+    except Exception as error:
+        batchfile.Error = f"{type(error).__name__}: {error}"
+    batchfile.Seconds = time.perf_counter()-start
+    return batchfile
+
+def ConvertBatch(files: [], threads, stream=False, jobs=1, cache=None, prune=False, validate=False):
+    """Convert every file on a pool of threads, which share the imports and the expression translations
+
+    jobs > 1 needs a single thread: a pool of processes forked while other threads run can deadlock."""
+    if jobs > 1 and threads > 1:
+        raise Exception("A batch can only generate on several processes with a single thread")
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(lambda batchfile: ConvertFile(batchfile, stream, jobs, cache, prune, validate), files))
+
+def PrintBatchSummary(files: []):
+    # one line per file followed by the problems found in it, then the totals; returns the number of files which failed
+    width = max(len(batchfile.Path) for batchfile in files)
+    print(f"{'file':<{width}}  {'seconds':>8}  {'nodes':>8}  {'scenes':>7}  result")
+    for batchfile in files:
+        result = "ok" if batchfile.Error == None else batchfile.Error
+        if batchfile.Pruned > 0:
+            result += f" (pruned {batchfile.Pruned} nodes)"
+        print(f"{batchfile.Path:<{width}}  {batchfile.Seconds:>8.2f}  {batchfile.Nodes:>8}  {batchfile.Scenes:>7}  {result}")
+        for severity, message in batchfile.Problems:
+            print(f"    {severity}: {message}")
+    failed = sum(1 for batchfile in files if batchfile.Error != None)
+    print(f"{len(files)} files converted in {sum(batchfile.Seconds for batchfile in files):.2f}s of conversion time, {failed} failed")
+    return failed
@@ -0,0 +1,140 @@
+import argparse
+import gc
+import json
+import math
+import os
+import tempfile
+
+from ArticyGenerate import WriteExport
+from ArticyProject import Convert
+from ArticyProfile import Profiler
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# phases quicker than this at the largest size are left out of the fit, their times are mostly noise
+MIN_FIT_SECONDS = 0.005
+
+# how much a scaling exponent may grow over the baseline's before it is flagged
+DEFAULT_TOLERANCE = 0.2
+
+# --------------------------------------
+
+def TimeConversion(path, jobs=1, stream=False):
+    """Convert an export in this process and return the seconds taken by each phase, including writing the Ren'Py text"""
+    profiler = Profiler(tracememory=False)
+    project = Convert(path, stream=stream, jobs=jobs, profiler=profiler)
+    with profiler.Phase('write'):
+        f = open(os.devnull, 'w')
+        f.write(project.RenpyText())
+        f.close()
+    del project
+    gc.collect()
+
+    seconds = {}
+    for phase in profiler.Phases:
+        seconds[phase['name']] = seconds.get(phase['name'], 0)+phase['wall']
+    seconds['total'] = sum(phase['wall'] for phase in profiler.Phases)
+    return seconds
+
+def ScalingExponent(sizes: [], seconds: []):
+    # the least squares slope of log(seconds) against log(size): 1 is linear, 2 quadratic
+    points = [(math.log(size), math.log(second)) for size, second in zip(sizes, seconds) if second > 0]
+    if len(points) < 2 or max(seconds) < MIN_FIT_SECONDS:
+        return None
+    meanx = sum(x for x, y in points)/len(points)
+    meany = sum(y for x, y in points)/len(points)
+    spread = sum((x-meanx)**2 for x, y in points)
+    if spread == 0:
+        return None
+    return sum((x-meanx)*(y-meany) for x, y in points)/spread
+
+def RunBenchmark(sizes: [], repeat=1, jobs=1, stream=False, workdir=None, seed=1):
+    """Time every phase on generated exports of each size, keeping the quickest of repeat runs
+
+    Returns {'sizes': the flow nodes actually generated, 'phases': {name: {'seconds': [...], 'exponent': x}}}."""
+    if workdir == None:
+        workdir = tempfile.mkdtemp(prefix='articybench')
+    nodes = []
+    timings = []
+    for size in sizes:
+        path = os.path.join(workdir, f"bench{size}.json")
+        nodes.append(WriteExport(path, size, seed))
+        best = {}
+        for run in range(repeat):
+            for name, seconds in TimeConversion(path, jobs, stream).items():
+                best[name] = min(best.get(name, seconds), seconds)
+        timings.append(best)
+        os.remove(path)
+
+    phases = {}
+    for timing in timings:
+        for name in timing:
+            if name not in phases:
+                phases[name] = {}
+    for name in phases:
+        seconds = [timing.get(name, 0) for timing in timings]
+        phases[name] = {'seconds': seconds, 'exponent': ScalingExponent(nodes, seconds)}
+    return {'sizes': nodes, 'phases': phases}
+
+def CompareWithBaseline(results: {}, baseline: {}, tolerance=DEFAULT_TOLERANCE):
+    """The phases which scale worse than in the baseline and worse than linearly, as (name, exponent, baseline exponent)"""
+    regressions = []
+    for name, phase in results['phases'].items():
+        if name not in baseline['phases']:
+            continue
+        exponent = phase['exponent']
+        baselineexponent = baseline['phases'][name]['exponent']
+        if exponent == None or baselineexponent == None:
+            continue
+        if exponent > max(baselineexponent, 1.0)+tolerance:
+            regressions.append((name, exponent, baselineexponent))
+    return regressions
+
+def PrintResults(results: {}, baseline: {} = None):
+    sizes = results['sizes']
+    print(f"{'phase':<20}" + "".join(f"{size:>12}" for size in sizes) + f"{'exponent':>10}" + (f"{'baseline':>10}" if baseline != None else ""))
+    for name, phase in results['phases'].items():
+        exponent = phase['exponent']
+        line = f"{name:<20}" + "".join(f"{seconds:>12.4f}" for seconds in phase['seconds'])
+        line += f"{exponent:>10.2f}" if exponent != None else f"{'-':>10}"
+        if baseline != None:
+            baselineexponent = baseline['phases'].get(name, {}).get('exponent')
+            line += f"{baselineexponent:>10.2f}" if baselineexponent != None else f"{'-':>10}"
+        print(line)
+
+# --------------------------------------
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time each phase of Articy2Renpy on generated exports of growing size and report how it scales')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES), help='comma separated numbers of flow nodes to generate (default '+','.join(str(size) for size in DEFAULT_SIZES)+')')
+    parser.add_argument('--repeat', type=int, default=1, help='runs at each size, the quickest is kept (default 1)')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='number of processes generating the scenes (default 1)')
+    parser.add_argument('-s', '--stream', action='store_true', help='read the exports one model at a time')
+    parser.add_argument('--seed', type=int, default=1, help='random seed of the generated exports (default 1)')
+    parser.add_argument('--workdir', help='directory for the generated exports (default a temporary directory)')
+    parser.add_argument('--save-baseline', help='JSON file to save the results into, for later runs to compare with')
+    parser.add_argument('--baseline', help='JSON file saved by --save-baseline, phases scaling worse than in it are reported and the exit status is 1')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help=f'how much a scaling exponent may grow over the baseline (default {DEFAULT_TOLERANCE})')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline != None:
+        f = open(args.baseline)
+        baseline = json.load(f)
+        f.close()
+
+    results = RunBenchmark([int(size) for size in args.sizes.split(',')], args.repeat, args.jobs, args.stream, args.workdir, args.seed)
+    PrintResults(results, baseline)
+
+    if args.save_baseline != None:
+        f = open(args.save_baseline, 'w')
+        json.dump(results, f, indent=2)
+        f.write('\n')
+        f.close()
+
+    if baseline != None:
+        regressions = CompareWithBaseline(results, baseline, args.tolerance)
+        for name, exponent, baselineexponent in regressions:
+            print(f"Regression: {name} scales as n^{exponent:.2f}, the baseline scaled as n^{baselineexponent:.2f}")
+        if len(regressions) > 0:
+            exit(1)
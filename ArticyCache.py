@@ -0,0 +1,139 @@
+import hashlib
+import io
+import json
+import os
+import pickle
+
+import ArticyCoreClass
+from ArticyCoreClass import ArticyID
+from ArticyCoreClass import Dialog
+from ArticyCoreClass import Code
+from ArticyCoreClass import Scene
+
+# bump when the cache layout or the scene hash changes; changes to the generator in ArticyCoreClass invalidate the cache by themselves
+CACHE_VERSION = 2
+
+DEFAULT_CACHE_SIZE = 10000
+
+# --------------------------------------
+
+def GeneratorVersion():
+    # the cache version combined with a hash of the generator's source
+    f = open(ArticyCoreClass.__file__, 'rb')
+    source = f.read()
+    f.close()
+    return f"{CACHE_VERSION}:{hashlib.sha256(source).hexdigest()}"
+
+class SceneHasher:
+    """Hashes everything CreateRenpyScene reads for prepared scenes and snippets, so the cache can tell which have changed
+
+    The fields of every node a scene's flow reaches are gathered into one flat list and hashed in one go, rather than
+    hashing node by node. The prefixes the images of the dialogs are named by are only worked out once."""
+
+    def __init__(self):
+        self.Prefixes = {}  # id(scene or snippet) -> its prefix
+
+    def Prefix(self, scene):
+        if scene == None:
+            return None
+        prefix = self.Prefixes.get(id(scene))
+        if prefix == None:
+            prefix = scene.Prefix()
+            self.Prefixes[id(scene)] = prefix
+        return prefix
+
+    def Hash(self, scene):
+        """The hash of the prefix and title of a prepared scene and the fields of every node its flow reaches from First:
+        the dialogs, conditions, instructions, codes and hubs, and the snippets it calls
+
+        The nodes each node leads to are named by their IDs, their own fields are added when the flow reaches them."""
+        fields = [self.Prefix(scene), scene.Title()]
+        seen = set()
+        pending = [scene.First]
+        while len(pending) > 0:
+            node = pending.pop()
+            if node == None or id(node) in seen:
+                continue
+            seen.add(id(node))
+            if type(node) == Dialog:
+                speaker = node.Speaker.Abbrev if node.Speaker != None else None
+                # the prefix of the scene itself is already in the fields, the prefix of any other parent is added
+                parent = None if node.Parent is scene else self.Prefix(node.Parent)
+                fields.extend((node.ID, node.Text, node.MenuText, node.Image, node.Transition, speaker, parent, len(node.Inputs), node.OutputIDs))
+            elif type(node) == Code:
+                fields.extend(('Code', node.Frag.ID, node.Desc, node.Text, len(node.Inputs), node.Frag.OutputIDs))
+            elif isinstance(node, Scene):
+                # a snippet called from the scene
+                fields.extend(('Snippet', node.Frag.ID, node.Desc, self.Prefix(node), len(node.Inputs), node.Frag.OutputIDs))
+            else:
+                fields.extend((type(node).__name__, node.Frag.ID, node.Desc, len(node.Inputs), node.Frag.OutputIDs))
+            pending.extend(node.Outputs)
+
+        # pickled without the memo, so the same fields give the same bytes however their strings happen to be shared
+        buffer = io.BytesIO()
+        pickler = pickle.Pickler(buffer, protocol=4)
+        pickler.fast = True
+        pickler.dump(fields)
+        return hashlib.sha256(buffer.getvalue()).hexdigest()
+
+# --------------------------------------
+
+class SceneCache:
+    """The generated lines and images of each scene and snippet, kept on disk between runs (only in memory when path is None)
+
+    Entries are keyed on the scene's Articy ID and only used while the hash of its subgraph is unchanged.
+    When there are more than maxentries, the ones used least recently are dropped."""
+
+    def __init__(self, path, maxentries=DEFAULT_CACHE_SIZE):
+        self.Path = path
+        self.MaxEntries = maxentries
+        self.Version = GeneratorVersion()
+        self.Run = 0
+        self.Entries = {}
+        self.Hits = 0
+        self.Misses = 0
+
+    def Load(self):
+        if self.Path != None and os.path.exists(self.Path):
+            try:
+                f = open(self.Path, encoding='utf-8')
+                data = json.load(f)
+                f.close()
+            except (OSError, ValueError):
+                data = None
+            if data != None and data.get('Version') == self.Version:
+                self.Run = data['Run']
+                self.Entries = data['Entries']
+        self.Run += 1
+
+    def StartRun(self):
+        # --watch keeps the cache in memory from one conversion to the next rather than loading it again
+        self.Run += 1
+        self.Hits = 0
+        self.Misses = 0
+
+    def Save(self):
+        if len(self.Entries) > self.MaxEntries:
+            keep = sorted(self.Entries.items(), key=lambda entry: entry[1]['Used'], reverse=True)[:self.MaxEntries]
+            self.Entries = dict(keep)
+        if self.Path == None:
+            return
+        f = open(self.Path, 'w', encoding='utf-8')
+        json.dump({'Version': self.Version, 'Run': self.Run, 'Entries': self.Entries}, f)
+        f.close()
+
+    def Lookup(self, scene, graphhash):
+        # sets the scene's lines and images from the cache, returns False if they have to be generated
+        entry = self.Entries.get(ArticyID(scene.Frag.ID))
+        if entry == None or entry['Hash'] != graphhash:
+            self.Misses += 1
+            return False
+        entry['Used'] = self.Run
+        scene.Lines = entry['Text'].split("\n") if len(entry['Text']) > 0 else []
+        scene.Images = entry['Images']
+        self.Hits += 1
+        return True
+
+    def Store(self, scene, graphhash):
+        # the lines are kept as one string, which is much quicker to save and load than a list of many short ones
+        self.Entries[ArticyID(scene.Frag.ID)] = {'Hash': graphhash, 'Used': self.Run, 'Text': "\n".join(scene.Lines), 'Images': scene.Images}
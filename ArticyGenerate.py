@@ -0,0 +1,201 @@
+import argparse
+import json
+import random
+
+# the characters every generated export has, as (display name, abbreviated name)
+CHARACTERS = [('Aurora', 'au'), ('Art', 'art'), ('Narrator', 'n'), ('Command', 'command')]
+
+STAGE_DIRECTIONS = ['', '', 'aurora smirks', 'art sad', 'park day|fade', 'park day', 'room|']
+CONDITIONS = ['GameVars.met_aurora == true', 'GameVars.x > 3 && GameVars.flag == false', 'GameVars.a == false || GameVars.b == false']
+INSTRUCTIONS = ['GameVars.met_aurora = true', 'GameVars.x = GameVars.x + 1']
+
+# fragments per scene and scenes per episode when only the number of fragments is given
+SCENE_SIZE = 50
+EPISODE_SIZE = 20
+
+# --------------------------------------
+
+class ExportGenerator:
+    """Builds a synthetic Articy export in the shape Articy2Renpy expects
+
+    Each scene is a chain of blocks: dialogs, menus (a question, 2-4 choices and a join), conditions with
+    two branches, instructions, hubs, code blocks and snippets. The rates are the chance of each block."""
+
+    def __init__(self, seed=1, menus=0.15, conditions=0.13, instructions=0.07, hubs=0.05, codes=0.04, snippets=0.04):
+        self.Random = random.Random(seed)
+        self.Rates = [('menu', menus), ('condition', conditions), ('instruction', instructions), ('hub', hubs), ('code', codes), ('snippet', snippets)]
+        self.NextID = 0x0100000000000000
+        self.Models = []
+        self.Characters = []
+        self.Fragments = 0  # the flow nodes made so far inside scenes
+
+    def NewID(self):
+        self.NextID += 1
+        return f"0x{self.NextID:016X}"
+
+    def Node(self, modeltype, properties):
+        # a model with a single output pin, its properties are returned so it can be linked
+        properties['OutputPins'] = [{'Id': self.NewID(), 'Connections': []}]
+        self.Models.append({'Type': modeltype, 'Properties': properties})
+        return properties
+
+    def Link(self, source, target):
+        source['OutputPins'][0]['Connections'].append({'Label': '', 'TargetPin': self.NewID(), 'Target': target['Id']})
+
+    def Fragment(self, modeltype, properties):
+        self.Fragments += 1
+        return self.Node(modeltype, properties)
+
+    def Dialog(self, parent, menutext=""):
+        return self.Fragment('DialogueFragment', {'Id': self.NewID(), 'Parent': parent['Id'], 'MenuText': menutext, 'Speaker': self.Random.choice(self.Characters),
+                             'StageDirections': self.Random.choice(STAGE_DIRECTIONS), 'Text': f"Line {self.Fragments} says \"hi\"\nsecond"})
+
+    def Block(self, parent, depth):
+        # one block of a scene, returns its first node and the nodes the next block follows on from
+        roll = self.Random.random()
+        kind = 'dialog'
+        for name, rate in self.Rates:
+            if roll < rate:
+                kind = name
+                break
+            roll -= rate
+
+        if kind == 'menu' and depth < 2:
+            question = self.Dialog(parent)
+            join = self.Dialog(parent)
+            for choice in range(self.Random.randint(2, 4)):
+                item = self.Dialog(parent, f"Choice {choice} it's")
+                self.Link(question, item)
+                first, tails = self.Chain(parent, self.Random.randint(0, 2), depth+1)
+                if first != None:
+                    self.Link(item, first)
+                    for tail in tails:
+                        self.Link(tail, join)
+                else:
+                    self.Link(item, join)
+            return (question, [join])
+
+        if kind == 'condition' and depth < 2:
+            condition = self.Fragment('Condition', {'Id': self.NewID(), 'DisplayName': '', 'Parent': parent['Id'], 'Text': '', 'Expression': self.Random.choice(CONDITIONS)})
+            join = self.Dialog(parent)
+            for branch in range(2):
+                first, tails = self.Chain(parent, self.Random.randint(1, 2), depth+1)
+                self.Link(condition, first)
+                for tail in tails:
+                    self.Link(tail, join)
+            return (condition, [join])
+
+        if kind == 'instruction':
+            node = self.Fragment('Instruction', {'Id': self.NewID(), 'DisplayName': '', 'Parent': parent['Id'], 'Text': '', 'Expression': self.Random.choice(INSTRUCTIONS)})
+            return (node, [node])
+
+        if kind == 'hub':
+            node = self.Fragment('Hub', {'Id': self.NewID(), 'DisplayName': 'Hub', 'Parent': parent['Id'], 'Text': ''})
+            return (node, [node])
+
+        if kind == 'code':
+            node = self.Fragment('FlowFragment', {'Id': self.NewID(), 'DisplayName': 'Code stuff', 'Parent': parent['Id'], 'Text': "x = 1\n\ny = 2"})
+            return (node, [node])
+
+        if kind == 'snippet' and depth == 0:
+            snippet = self.Fragment('FlowFragment', {'Id': self.NewID(), 'DisplayName': f"Snippet {self.Random.randint(1, 20)} inner", 'Parent': parent['Id'], 'Text': ''})
+            first, tails = self.Chain(snippet, self.Random.randint(1, 3), 1)
+            for tail in tails:
+                self.Link(tail, snippet)
+            return (snippet, [snippet])
+
+        node = self.Dialog(parent)
+        return (node, [node])
+
+    def Chain(self, parent, count, depth):
+        # count blocks one after the other
+        first = None
+        tails = []
+        for i in range(count):
+            start, ends = self.Block(parent, depth)
+            if first == None:
+                first = start
+            for tail in tails:
+                self.Link(tail, start)
+            tails = ends
+        return (first, tails)
+
+    def Scene(self, scene, fragments):
+        # blocks are added until the scene has about the number of fragments asked for, the last one leads back out of the scene
+        target = self.Fragments+fragments
+        tails = []
+        while self.Fragments < target:
+            start, ends = self.Block(scene, 0)
+            for tail in tails:
+                self.Link(tail, start)
+            tails = ends
+        for tail in tails:
+            self.Link(tail, scene)
+
+    def Build(self, episodes, scenes, fragments):
+        """Build an export of episodes episodes of scenes scenes each, with about fragments flow nodes in each scene"""
+        for name, abbreviation in CHARACTERS:
+            character = {'Id': self.NewID(), 'DisplayName': name, 'Color': {'r': 0.5, 'g': 0.25, 'b': 1.0}}
+            self.Models.append({'Type': 'DefaultMainCharacterTemplate_02', 'Properties': character,
+                                'Template': {'DefaultBasicCharacterFeature_02': {'AbreviatedName': abbreviation}}})
+            self.Characters.append(character['Id'])
+        self.Models.append({'Type': 'Entity', 'Properties': {'Id': self.NewID()}})
+
+        game = self.Node('FlowFragment', {'Id': self.NewID(), 'DisplayName': 'Game My Story', 'Parent': '0x0', 'Text': ''})
+        previousepisode = None
+        for e in range(1, episodes+1):
+            episode = self.Node('FlowFragment', {'Id': self.NewID(), 'DisplayName': f"Episode {e} The part", 'Parent': game['Id'], 'Text': ''})
+            if previousepisode != None:
+                self.Link(previousepisode, episode)
+            previousepisode = episode
+
+            previous = None
+            for s in range(1, scenes+1):
+                scene = self.Node('Dialogue', {'Id': self.NewID(), 'DisplayName': f"Scene{s} place", 'Parent': episode['Id'], 'Text': ''})
+                if previous != None:
+                    self.Link(previous, scene)
+                previous = scene
+                self.Scene(scene, fragments)
+
+        # Articy does not keep the models in flow order
+        self.Random.shuffle(self.Models)
+        half = len(self.Models)//2
+        return {'Settings': {}, 'Packages': [{'Name': 'Story', 'Models': self.Models[:half]}, {'Name': 'Characters', 'Models': self.Models[half:]}]}
+
+# --------------------------------------
+
+def SizeExport(fragments):
+    """The (episodes, scenes, fragments per scene) of an export with about fragments flow nodes"""
+    scenes = max(1, fragments//SCENE_SIZE)
+    episodes = max(1, scenes//EPISODE_SIZE)
+    return (episodes, max(1, scenes//episodes), max(1, fragments//scenes))
+
+def WriteExport(path, fragments, seed=1, episodes=None, scenes=None):
+    """Write a synthetic export with about fragments flow nodes to path, returns the number of flow nodes written"""
+    sizedepisodes, sizedscenes, perscene = SizeExport(fragments)
+    if episodes == None:
+        episodes = sizedepisodes
+    if scenes == None:
+        scenes = sizedscenes
+    perscene = max(1, fragments//(episodes*scenes))
+
+    generator = ExportGenerator(seed)
+    export = generator.Build(episodes, scenes, perscene)
+    f = open(path, 'w')
+    json.dump(export, f)
+    f.close()
+    return generator.Fragments
+
+# --------------------------------------
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic Articy JSON export for testing and benchmarking Articy2Renpy')
+    parser.add_argument('-o', required=True, help='JSON file to write')
+    parser.add_argument('-n', '--fragments', type=int, default=1000, help='about how many flow nodes (dialogs, conditions, instructions, ...) to generate (default 1000)')
+    parser.add_argument('--episodes', type=int, help=f'number of episodes (default one per {EPISODE_SIZE} scenes)')
+    parser.add_argument('--scenes', type=int, help=f'number of scenes in each episode (default one per {SCENE_SIZE} fragments)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed, the same seed and sizes give the same export (default 1)')
+    args = parser.parse_args()
+
+    written = WriteExport(args.o, args.fragments, args.seed, args.episodes, args.scenes)
+    print(f"{args.o}: {written} flow nodes")
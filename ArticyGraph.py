@@ -0,0 +1,168 @@
+import multiprocessing
+import time
+
+from ArticyCoreClass import EMPTY
+from ArticyCoreClass import Character
+from ArticyCoreClass import FlowFrag
+from ArticyCoreClass import Episode
+from ArticyCoreClass import Scene
+from ArticyCoreClass import Dialog
+from ArticyCoreClass import Condition
+from ArticyCoreClass import Instruction
+from ArticyCoreClass import Snippet
+from ArticyCoreClass import Code
+from ArticyCoreClass import Game
+from ArticyCoreClass import Hub
+
+# the node classes which can be packed, by name
+NODE_CLASSES = {cls.__name__: cls for cls in (Character, FlowFrag, Episode, Scene, Dialog, Condition, Instruction, Snippet, Code, Game, Hub)}
+
+# attributes holding a single node, and a list of nodes
+REF_ATTRS = ('Frag', 'Speaker', 'Parent', 'First')
+REFLIST_ATTRS = ('Outputs', 'Inputs', 'Children')
+
+# the flow fragment and character a node refers to are packed along with it
+OWNED_ATTRS = ('Frag', 'Speaker')
+
+# --------------------------------------
+
+def NodeAttributes(cls):
+    # the nodes use __slots__, so their attributes are the slots declared along the class hierarchy
+    attrs = []
+    for klass in reversed(cls.__mro__):
+        for attr in klass.__dict__.get('__slots__', ()):
+            if attr not in attrs:
+                attrs.append(attr)
+    return tuple(attrs)
+
+def PackNodes(nodes: [], overrides: {} = {}):
+    """Flatten linked nodes into plain tuples, with references to other nodes stored as indices
+
+    Returns (fields, records): fields maps each class name to its attribute names, each record is
+    (class name, attribute values). Every node referenced through REF_ATTRS or REFLIST_ATTRS must be in
+    nodes, apart from the OWNED_ATTRS objects which are added to the end as they are found. None is
+    stored as -1. overrides maps id(node) to attribute values to pack in place of the node's own.
+    Deep chains of dialogs can then be pickled without recursing through them."""
+    nodes = list(nodes)
+    index = {}
+    for i, node in enumerate(nodes):
+        index[id(node)] = i
+
+    def Ref(node, owned):
+        if node == None:
+            return -1
+        i = index.get(id(node))
+        if i == None:
+            if not owned:
+                raise Exception(f"Node {node} is referenced but not packed")
+            i = len(nodes)
+            index[id(node)] = i
+            nodes.append(node)
+        return i
+
+    fields = {}
+    records = []
+    i = 0
+    while i < len(nodes):
+        node = nodes[i]
+        name = type(node).__name__
+        if name not in fields:
+            fields[name] = NodeAttributes(type(node))
+        override = overrides.get(id(node), {})
+        values = []
+        for attr in fields[name]:
+            if attr in override:
+                value = override[attr]
+            else:
+                value = getattr(node, attr)
+            if attr in REF_ATTRS:
+                value = Ref(value, attr in OWNED_ATTRS)
+            elif attr in REFLIST_ATTRS:
+                value = [Ref(item, False) for item in value]
+            values.append(value)
+        records.append((name, tuple(values)))
+        i += 1
+    return (fields, records)
+
+def UnpackNodes(packed):
+    """Rebuild the nodes flattened by PackNodes, in the same order"""
+    fields, records = packed
+    nodes = []
+    for name, values in records:
+        cls = NODE_CLASSES[name]
+        nodes.append(cls.__new__(cls))
+    nodes.append(None)  # so the -1 stored for None resolves to None
+
+    # how each attribute of a class is stored: 0 as is, 1 a node, 2 a list of nodes
+    kinds = {}
+    for name, attrs in fields.items():
+        kinds[name] = tuple(zip(attrs, [1 if attr in REF_ATTRS else 2 if attr in REFLIST_ATTRS else 0 for attr in attrs]))
+
+    for node, (name, values) in zip(nodes, records):
+        for (attr, kind), value in zip(kinds[name], values):
+            if kind == 1:
+                value = nodes[value]
+            elif kind == 2:
+                if len(value) > 0:
+                    value = [nodes[i] for i in value]
+                else:
+                    value = EMPTY
+            setattr(node, attr, value)
+
+    nodes.pop()
+    return nodes
+
+# --------------------------------------
+
+# the linked nodes in a worker process of GenerateScenesInParallel, set once by InitWorker
+WorkerNodes = None
+
+# tasks sent to each process, the scenes are shared out in this many batches per process so the slow ones even out
+BATCHES_PER_JOB = 4
+
+def InitWorker(nodes, packed):
+    # runs once in each worker process: a forked process inherits the nodes as they are, a spawned one unpacks them
+    global WorkerNodes
+    if packed != None:
+        WorkerNodes = UnpackNodes(packed)
+    else:
+        WorkerNodes = nodes
+
+def GenerateWorkerScene(i):
+    """Run CreateRenpyScene on node i of the worker's nodes, returning its lines, images and the seconds it took"""
+    scene = WorkerNodes[i]
+    start = time.perf_counter()
+    lines = scene.CreateRenpyScene()
+    return (lines, scene.Images, time.perf_counter()-start)
+
+def GenerateScenesInParallel(scenes: [], jobs, nodes: []):
+    """Generate prepared scenes on a pool of jobs processes, keeping the results in the order of scenes
+
+    nodes is every linked node the scenes belong to. It is sent to each process once, when the pool starts: as it is
+    when the processes are forked, packed when they are spawned (as on Windows). The tasks only name the scenes by
+    their position in nodes. Returns the seconds each scene took to generate in its process."""
+    positions = {}
+    for i, node in enumerate(nodes):
+        positions[id(node)] = i
+    indices = [positions[id(scene)] for scene in scenes]
+
+    if multiprocessing.get_start_method() == 'fork':
+        initargs = (nodes, None)
+    else:
+        # the generation only counts the inputs of a node, so they are packed as that many Nones (pruned nodes may still be named there)
+        overrides = {}
+        for node in nodes:
+            inputs = getattr(node, 'Inputs', EMPTY)
+            if len(inputs) > 0:
+                overrides[id(node)] = {'Inputs': [None]*len(inputs)}
+        initargs = (None, PackNodes(nodes, overrides))
+    chunksize = max(1, len(indices)//(jobs*BATCHES_PER_JOB))
+    with multiprocessing.Pool(jobs, initializer=InitWorker, initargs=initargs) as pool:
+        results = pool.map(GenerateWorkerScene, indices, chunksize)
+
+    seconds = []
+    for scene, (lines, images, sceneseconds) in zip(scenes, results):
+        scene.Lines = lines
+        scene.Images = images
+        seconds.append(sceneseconds)
+    return seconds
@@ -0,0 +1,151 @@
+import json
+import re
+
+CHUNK_SIZE = 1 << 16
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+STRUCTURE = re.compile(r'["\[\]{}]')
+SCALAR_END = re.compile(r'[ \t\n\r,\]}]')
+STRING_END = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+
+# --------------------------------------
+
+class JsonStream:
+    """Read a JSON document a chunk at a time, decoding only the values asked for"""
+
+    def __init__(self, f, chunksize=CHUNK_SIZE):
+        self.File = f
+        self.ChunkSize = chunksize
+        self.Buffer = ''
+        self.Pos = 0
+        self.EOF = False
+        self.Decoder = json.JSONDecoder()
+
+    def Fill(self):
+        # drop everything already consumed and read the next chunk
+        if self.EOF:
+            return False
+        chunk = self.File.read(self.ChunkSize)
+        if len(chunk) == 0:
+            self.EOF = True
+            return False
+        self.Buffer = self.Buffer[self.Pos:] + chunk
+        self.Pos = 0
+        return True
+
+    def Peek(self):
+        # skip whitespace and return the next character without consuming it
+        while True:
+            self.Pos = WHITESPACE.match(self.Buffer, self.Pos).end()
+            if self.Pos < len(self.Buffer):
+                return self.Buffer[self.Pos]
+            if not self.Fill():
+                raise ValueError("Unexpected end of JSON")
+
+    def Expect(self, char):
+        found = self.Peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found '{found}' in JSON")
+        self.Pos += 1
+
+    def Decode(self):
+        # decode the whole value at the current position
+        char = self.Peek()
+        if char != '"' and char != '[' and char != '{':
+            # a number split between chunks would decode as its first part ("1." as 1), so read on until it ends
+            while SCALAR_END.search(self.Buffer, self.Pos) == None and self.Fill():
+                pass
+        while True:
+            try:
+                value, end = self.Decoder.raw_decode(self.Buffer, self.Pos)
+            except json.JSONDecodeError:
+                # the value runs past the end of the buffer
+                if not self.Fill():
+                    raise
+                continue
+            self.Pos = end
+            return value
+
+    def Skip(self):
+        # step over the value at the current position without building it
+        char = self.Peek()
+        if char != '[' and char != '{':
+            self.Decode()
+            return
+
+        depth = 0
+        while True:
+            found = STRUCTURE.search(self.Buffer, self.Pos)
+            if found == None:
+                self.Pos = len(self.Buffer)
+                if not self.Fill():
+                    raise ValueError("Unexpected end of JSON")
+                continue
+
+            self.Pos = found.start()
+            char = found.group()
+            if char == '"':
+                end = STRING_END.match(self.Buffer, self.Pos+1)
+                if end == None:
+                    # the string runs past the end of the buffer
+                    if not self.Fill():
+                        raise ValueError("Unexpected end of JSON")
+                    continue
+                self.Pos = end.end()
+            else:
+                self.Pos += 1
+                if char == '[' or char == '{':
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        return
+
+    def Object(self):
+        # yields each key of the object at the current position, the caller must consume (Decode or Skip) its value
+        self.Expect('{')
+        if self.Peek() == '}':
+            self.Pos += 1
+            return
+        while True:
+            key = self.Decode()
+            self.Expect(':')
+            yield key
+            char = self.Peek()
+            self.Pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' or '}}' but found '{char}' in JSON")
+
+    def Array(self):
+        # yields once for each item of the array at the current position, the caller must consume the item
+        self.Expect('[')
+        if self.Peek() == ']':
+            self.Pos += 1
+            return
+        while True:
+            yield
+            char = self.Peek()
+            self.Pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' or ']' but found '{char}' in JSON")
+
+# --------------------------------------
+
+def StreamModels(f, chunksize=CHUNK_SIZE):
+    """Yield each model of an Articy export (Packages[*].Models[*]) one at a time, skipping the rest of the document"""
+    stream = JsonStream(f, chunksize)
+    for key in stream.Object():
+        if key == 'Packages':
+            for package in stream.Array():
+                for packagekey in stream.Object():
+                    if packagekey == 'Models':
+                        for model in stream.Array():
+                            yield stream.Decode()
+                    else:
+                        stream.Skip()
+        else:
+            stream.Skip()
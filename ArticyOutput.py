@@ -0,0 +1,136 @@
+import filecmp
+import hashlib
+import os
+
+from ArticyCoreClass import ArticyID
+
+# the file listing the images needed, written alongside the scene files
+IMAGES_FILE_NAME = 'images.txt'
+
+# the file listing the scene files written to the directory, only files named in it are ever removed from there
+MANIFEST_FILE_NAME = 'articy2renpy_files.txt'
+
+# the output files are written through a buffer this big, rather than a system call for every few lines
+WRITE_BUFFER_SIZE = 1 << 20
+
+# --------------------------------------
+
+def ContentHash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def WriteAtomic(path, chunks, skipunchanged=False):
+    """Write the strings in chunks to path as UTF-8, through a temporary file renamed over path once it is complete
+
+    Ren'Py (or anything else watching the file) then sees either the old file or the new one, never a half-written one.
+    With skipunchanged, a file which already held the same content is left as it was. Returns True if path was written."""
+    temppath = path+".tmp"
+    f = open(temppath, "w", encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+    try:
+        for chunk in chunks:
+            f.write(chunk)
+        f.close()
+    except BaseException:
+        f.close()
+        os.remove(temppath)
+        raise
+    if skipunchanged and os.path.exists(path) and filecmp.cmp(temppath, path, shallow=False):
+        os.remove(temppath)
+        return False
+    os.replace(temppath, path)
+    return True
+
+def WriteIfChanged(path, text):
+    """Write text to path unless the file already holds the same content, returns True if the file was written
+
+    Skipping unchanged files keeps their modification times, so Ren'Py does not recompile them."""
+    if os.path.exists(path):
+        try:
+            f = open(path, encoding='utf-8')
+            existing = f.read()
+            f.close()
+        except UnicodeDecodeError:
+            existing = None
+        if existing != None and ContentHash(existing) == ContentHash(text):
+            return False
+
+    WriteAtomic(path, [text])
+    return True
+
+def SceneFileName(scene, used: set):
+    # scenes are named by their prefix, those which were never linked to an episode by their Articy ID
+    name = scene.Prefix()
+    if '?' in name:
+        name = f"unlinked_{ArticyID(scene.Frag.ID)}"
+    unique = name
+    count = 1
+    while unique in used:
+        count += 1
+        unique = f"{name}_{count}"
+    used.add(unique)
+    return unique+".rpy"
+
+def UniqueImages(scenes: []):
+    """Every image needed by the scenes, once each, in the order the scenes first use them"""
+    images = {}
+    for scene in scenes:
+        for imagename in scene.Images:
+            images[imagename] = None
+    return list(images)
+
+def ImageStubs(images: []):
+    # a placeholder for each image, so the game runs before the art is drawn; delete a line once its image file exists
+    lines = ["# Placeholders for the images the scenes need, generated by Articy2Renpy", ""]
+    for imagename in images:
+        text = imagename.replace('\\', '\\\\').replace('"', '\\"')
+        lines.append(f"image {imagename} = Placeholder(\"bg\", text=\"{text}\")")
+    return "".join(f"{line}\n" for line in lines)
+
+def WriteSceneFiles(outdir, scenes: [], removestale=True):
+    """Write one .rpy file per scene or snippet into outdir, plus the list of images, returns (written, skipped, removed)
+
+    The scene files an earlier run wrote (as listed in its manifest) for scenes which have since been deleted, renumbered
+    or pruned are removed, along with the .rpyc Ren'Py compiled from them, so the game does not keep running the old
+    scenes. Files the conversion did not write are never removed. removestale=False keeps them, for when only part of
+    the export was converted."""
+    os.makedirs(outdir, exist_ok=True)
+    manifestpath = os.path.join(outdir, MANIFEST_FILE_NAME)
+    previous = set()
+    if os.path.exists(manifestpath):
+        f = open(manifestpath, encoding='utf-8')
+        # a name with a directory in it was not written by a conversion
+        previous = {name for name in f.read().split("\n") if len(name) > 0 and os.path.basename(name) == name}
+        f.close()
+
+    written = 0
+    skipped = 0
+    used = set()
+    for scene in scenes:
+        text = "".join(f"{line}\n" for line in scene.Lines)+"\n"
+        if WriteIfChanged(os.path.join(outdir, SceneFileName(scene, used)), text):
+            written += 1
+        else:
+            skipped += 1
+
+    # the scene files already say which images each of them shows, the list only needs each image once
+    images = "".join(f"{imagename}\n" for imagename in UniqueImages(scenes))
+    if WriteIfChanged(os.path.join(outdir, IMAGES_FILE_NAME), images):
+        written += 1
+    else:
+        skipped += 1
+
+    removed = 0
+    filenames = {name+".rpy" for name in used}
+    if removestale:
+        for filename in sorted(previous-filenames):
+            path = os.path.join(outdir, filename)
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+            if os.path.exists(path+"c"):
+                os.remove(path+"c")
+    else:
+        # the files of the scenes left out are still the conversion's, a later full run may remove them
+        filenames |= previous
+    WriteIfChanged(manifestpath, "".join(f"{filename}\n" for filename in sorted(filenames)))
+
+    return (written, skipped, removed)
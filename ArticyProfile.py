@@ -0,0 +1,117 @@
+import json
+import time
+import tracemalloc
+
+# --------------------------------------
+
+class Phase:
+    """Times one phase of a conversion, used as a context manager by Profiler.Phase"""
+
+    def __init__(self, profiler, name):
+        self.Profiler = profiler
+        self.Name = name
+
+    def __enter__(self):
+        if tracemalloc.is_tracing():
+            # the peak is reset so it covers only this phase, the highest seen is kept on the profiler
+            self.Profiler.NotePeak(tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self.Wall = time.perf_counter()
+        self.CPU = time.process_time()
+        self.Inner = (self.Profiler.InnerWall, self.Profiler.InnerCPU)
+        return self
+
+    def __exit__(self, exctype, exc, tb):
+        # the time of any phase which ran inside this one is left out, it is reported on its own
+        wall = time.perf_counter()-self.Wall-(self.Profiler.InnerWall-self.Inner[0])
+        cpu = time.process_time()-self.CPU-(self.Profiler.InnerCPU-self.Inner[1])
+        peak = None
+        if tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            self.Profiler.NotePeak(peak)
+        self.Profiler.Phases.append({'name': self.Name, 'wall': wall, 'cpu': cpu, 'peak': peak})
+        self.Profiler.InnerWall += wall
+        self.Profiler.InnerCPU += cpu
+        return False
+
+# --------------------------------------
+
+class Stopwatch:
+    """Adds up the wall and CPU time between each Start and Stop, for work done a piece at a time"""
+
+    def __init__(self):
+        self.Wall = 0
+        self.CPU = 0
+
+    def Start(self):
+        self.StartWall = time.perf_counter()
+        self.StartCPU = time.process_time()
+
+    def Stop(self):
+        self.Wall += time.perf_counter()-self.StartWall
+        self.CPU += time.process_time()-self.StartCPU
+
+# --------------------------------------
+
+class Profiler:
+    """Collects the wall time, CPU time and peak allocations of each phase of a conversion, and the time taken to generate each scene"""
+
+    def __init__(self, tracememory=True):
+        self.Phases = []
+        self.Scenes = []
+        self.Peak = 0
+        self.InnerWall = 0  # the time of the phases so far, which a phase they ran inside leaves out
+        self.InnerCPU = 0
+        if tracememory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def Phase(self, name):
+        return Phase(self, name)
+
+    def AddPhase(self, name, stopwatch: Stopwatch):
+        # a phase timed a piece at a time inside another phase, such as generating the scenes as they are written
+        self.InnerWall += stopwatch.Wall
+        self.InnerCPU += stopwatch.CPU
+        self.Phases.append({'name': name, 'wall': stopwatch.Wall, 'cpu': stopwatch.CPU, 'peak': None})
+
+    def NotePeak(self, peak):
+        self.Peak = max(self.Peak, peak)
+
+    def AddScene(self, scene, seconds):
+        self.Scenes.append({'scene': scene.Prefix(), 'title': scene.Title(), 'seconds': seconds})
+
+    def Results(self):
+        # the phases in the order they ran, the scenes slowest first
+        scenes = sorted(self.Scenes, key=lambda scene: scene['seconds'], reverse=True)
+        total = {'wall': sum(phase['wall'] for phase in self.Phases), 'cpu': sum(phase['cpu'] for phase in self.Phases),
+                 'peak': self.Peak if tracemalloc.is_tracing() else None}
+        return {'phases': self.Phases, 'total': total, 'scenes': scenes}
+
+    def Save(self, path):
+        f = open(path, 'w')
+        json.dump(self.Results(), f, indent=2)
+        f.write('\n')
+        f.close()
+
+# --------------------------------------
+
+class NoProfiler:
+    """Stands in for a Profiler when the conversion is not being profiled"""
+
+    class NoPhase:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exctype, exc, tb):
+            return False
+
+    NO_PHASE = NoPhase()
+
+    def Phase(self, name):
+        return self.NO_PHASE
+
+    def AddPhase(self, name, stopwatch):
+        pass
+
+    def AddScene(self, scene, seconds):
+        pass
@@ -0,0 +1,522 @@
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+from ArticyCoreClass import Character
+from ArticyCoreClass import FlowFrag
+from ArticyCoreClass import Episode
+from ArticyCoreClass import Scene
+from ArticyCoreClass import Dialog
+from ArticyCoreClass import Condition
+from ArticyCoreClass import Instruction
+from ArticyCoreClass import Snippet
+from ArticyCoreClass import Code
+from ArticyCoreClass import Game
+from ArticyCoreClass import Hub
+from ArticyCoreClass import BuildChildIndex
+from ArticyCoreClass import FollowNext
+from ArticyCoreClass import InternID
+from ArticyJsonStream import StreamModels
+from ArticyGraph import GenerateScenesInParallel
+from ArticyCache import SceneHasher
+from ArticySnapshot import Fingerprint
+from ArticySnapshot import LoadSnapshot
+from ArticySnapshot import SaveSnapshot
+from ArticyProfile import NoProfiler
+from ArticyProfile import Stopwatch
+from ArticyOutput import UniqueImages
+from ArticyValidate import ValidateProject
+from ArticyValidate import ValidationError
+from ArticyValidate import CountErrors
+from ArticyPrune import PruneProject
+from ArticySelect import SelectModels
+
+# the most lines of a scene StreamRenpyChunks holds before passing them on
+STREAM_CHUNK_LINES = 1000
+
+# the first words of the names of the flow fragments which are parsed, see FlowFragKind
+FLOW_FRAG_KINDS = ('episode', 'scene', 'snippet', 'code', 'game')
+
+# the model types which are only found inside a scene or snippet, see InScene
+SCENE_MODEL_TYPES = ('DialogueFragment', 'Instruction', 'Condition', 'Hub')
+
+# --------------------------------------
+# The handler for each type of model, called with the project and the model
+
+def OutputTargets(properties):
+    # the (interned) IDs of the nodes connected to every output pin, in pin order
+    outputs = []
+    for outputpin in properties['OutputPins']:
+        if 'Connections' in outputpin:
+            for connection in outputpin['Connections']:
+                outputs.append(InternID(connection['Target']))
+    return outputs
+
+def ParseFrag(properties):
+    return FlowFrag(InternID(properties['Id']), properties['DisplayName'], InternID(properties['Parent']), properties['Text'], OutputTargets(properties))
+
+def ParseDialog(project, model):
+    properties = model['Properties']
+    dialog = Dialog(InternID(properties['Id']), InternID(properties['Parent']), properties['MenuText'], properties['StageDirections'], InternID(properties['Speaker']), properties['Text'], OutputTargets(properties))
+    project.Dialogs.append(dialog)
+    project.Nodes[dialog.ID] = dialog
+
+def ParseInstruction(project, model):
+    properties = model['Properties']
+    frag = ParseFrag(properties)
+    instruction = Instruction(frag, properties['Expression'])
+    project.Instructions.append(instruction)
+    project.Nodes[frag.ID] = instruction
+
+def ParseCondition(project, model):
+    properties = model['Properties']
+    frag = ParseFrag(properties)
+    condition = Condition(frag, properties['Expression'])
+    project.Conditions.append(condition)
+    project.Nodes[frag.ID] = condition
+
+def ParseHub(project, model):
+    frag = ParseFrag(model['Properties'])
+    hub = Hub(frag, "hub")
+    project.Hubs.append(hub)
+    project.Nodes[frag.ID] = hub
+
+def ParseCharacter(project, model):
+    # the basic feature is looked up by suffix, so other versions of the character template can be registered with this handler
+    properties = model['Properties']
+    color = properties['Color']
+    template = model['Template']
+    basic = None
+    for feature in template:
+        if feature.startswith('DefaultBasicCharacterFeature'):
+            basic = template[feature]
+            break
+    colorR = round(255*color['r'])
+    colorG = round(255*color['g'])
+    colorB = round(255*color['b'])
+    char = Character(InternID(properties['Id']), properties['DisplayName'], (colorR, colorG, colorB), basic['AbreviatedName'])
+    project.Characters.append(char)
+    project.Nodes[char.ID] = char
+
+def FlowFragKind(name):
+    # flow fragments are told apart by the first word of their name: game, episode, scene, snippet or code, None for any other
+    first = name.split()[0].lower()
+    for kind in FLOW_FRAG_KINDS:
+        if first[:len(kind)] == kind:
+            return kind
+    return None
+
+def ParseFlowFrag(project, model):
+    frag = ParseFrag(model['Properties'])
+    project.FlowFrags.append(frag)
+
+    kind = FlowFragKind(frag.Name)
+    if kind == 'episode':
+        episode = Episode(frag)
+        project.Episodes.append(episode)
+        project.Nodes[frag.ID] = episode
+    elif kind == 'scene':
+        scene = Scene(frag)
+        project.Scenes.append(scene)
+        project.Nodes[frag.ID] = scene
+    elif kind == 'snippet':
+        scene = Snippet(frag)
+        project.Snippets.append(scene)
+        project.Nodes[frag.ID] = scene
+    elif kind == 'code':
+        scene = Code(frag)
+        project.Codes.append(scene)
+        project.Nodes[frag.ID] = scene
+    elif kind == 'game':
+        project.TheGame = Game(frag)
+        project.Nodes[frag.ID] = project.TheGame
+
+# the handler of each model type, by the type's name
+MODEL_HANDLERS = {
+    'DialogueFragment': ParseDialog,
+    'Instruction': ParseInstruction,
+    'Condition': ParseCondition,
+    'Hub': ParseHub,
+    'DefaultMainCharacterTemplate_02': ParseCharacter,
+    'FlowFragment': ParseFlowFrag,
+    'Dialogue': ParseFlowFrag,
+}
+
+def RegisterModelHandler(modeltype, handler):
+    """Parse the models of another type (a custom template, a project-specific fragment) with handler(project, model)"""
+    MODEL_HANDLERS[modeltype] = handler
+
+def ParserVersion(handlers: {}):
+    # a hash of this file's source and of the handler of each model type, so a snapshot is only reused by the same parsing
+    f = open(__file__, 'rb')
+    sha = hashlib.sha256(f.read())
+    f.close()
+    for modeltype, handler in sorted(handlers.items()):
+        name = getattr(handler, '__qualname__', type(handler).__qualname__)
+        sha.update(f"{modeltype}={handler.__module__}.{name}\n".encode('utf-8'))
+    return sha.hexdigest()
+
+def InScene(model):
+    # whether the model is a node inside a scene or snippet, rather than the game, an episode, a scene, a character or another type
+    if model['Type'] in SCENE_MODEL_TYPES:
+        return True
+    if model['Type'] == 'FlowFragment' or model['Type'] == 'Dialogue':
+        return FlowFragKind(model['Properties']['DisplayName']) not in ('game', 'episode', 'scene')
+    return False
+
+def ExportModels(data):
+    # every model of the already loaded JSON, package by package
+    for package in data['Packages']:
+        for model in package['Models']:
+            yield model
+
+# --------------------------------------
+
+class ArticyProject:
+    """The structures parsed from one Articy export, and the Ren'Py generated from them"""
+
+    def __init__(self, profiler=None):
+        self.TheGame: Game = None
+        self.Characters = []
+        self.FlowFrags = []
+        self.Episodes = []
+        self.Scenes = []
+        self.Dialogs = []
+        self.Conditions = []
+        self.Snippets = []
+        self.Codes = []
+        self.Instructions = []
+        self.Hubs = []
+        self.Nodes = {}  # every parsed node by its (interned) Articy ID, used to resolve connections
+        self.Unhandled = Counter()  # how many models of each type were not converted
+        self.Handlers = dict(MODEL_HANDLERS)  # the model types parsed by this project, RegisterModelHandler adds to every new project
+        self.DialogsByParent = {}
+        self.Selected = None  # the IDs parsed by LoadSelection, None when the whole export was loaded
+        self.Problems = []  # the (severity, message) found by Validate
+        self.PruneCounts = {}  # {list name: (kept, dropped)} from Prune
+        self.LinkProblems = []  # the cycles Link found in the order of the episodes or scenes, Validate reports them and Prepare raises
+        self.Prepared = False  # set once the scenes have been prepared, pruning keeps the first node they were given
+        self.Profiler = profiler if profiler != None else NoProfiler()  # times each phase of the conversion, see ArticyProfile
+
+    def Lists(self):
+        # the node lists by name, as kept in a snapshot
+        return {'Characters': self.Characters, 'FlowFrags': self.FlowFrags, 'Episodes': self.Episodes, 'Scenes': self.Scenes, 'Dialogs': self.Dialogs,
+                'Conditions': self.Conditions, 'Snippets': self.Snippets, 'Codes': self.Codes, 'Instructions': self.Instructions, 'Hubs': self.Hubs}
+
+    def NodeCount(self):
+        # one node per character, flow fragment, dialog, condition, instruction and hub in the export
+        return len(self.Characters)+len(self.FlowFrags)+len(self.Dialogs)+len(self.Conditions)+len(self.Instructions)+len(self.Hubs)
+
+    def ParseModel(self, model):
+        # parse one model from the JSON file, adding it to the internal data structures
+        handler = self.Handlers.get(model['Type'])
+        if handler != None:
+            handler(self, model)
+        else:
+            self.Unhandled[model['Type']] += 1
+
+    def Load(self, source, stream=False):
+        """Parse an Articy export given as a path, an open file or the already loaded JSON"""
+        if isinstance(source, dict):
+            with self.Profiler.Phase('parse'):
+                for package in source['Packages']:
+                    for model in package['Models']:
+                        self.ParseModel(model)
+        elif hasattr(source, 'read'):
+            if stream:
+                # walk the models one at a time so the raw export is never held in memory as a whole, reading is timed with the parsing
+                with self.Profiler.Phase('parse'):
+                    for model in StreamModels(source):
+                        self.ParseModel(model)
+            else:
+                with self.Profiler.Phase('load'):
+                    data = json.load(source)
+                self.Load(data)
+        else:
+            f = open(source)
+            try:
+                self.Load(f, stream)
+            finally:
+                f.close()
+
+    def LoadSelection(self, source, selection, stream=False):
+        """Parse only the episodes, scenes and snippets picked by an ArticySelect.Selection, with the snippets they call
+
+        The models are read twice: the first pass parses the characters, game, episodes and scenes and notes the
+        parent and outputs of every model inside a scene, the second parses only those in the selection."""
+        if isinstance(source, dict):
+            self.ParseSelection(lambda: ExportModels(source), selection)
+        elif hasattr(source, 'read'):
+            if stream:
+                def models():
+                    # the file is streamed again for each pass
+                    source.seek(0)
+                    return StreamModels(source)
+                self.ParseSelection(models, selection)
+            else:
+                with self.Profiler.Phase('load'):
+                    data = json.load(source)
+                self.LoadSelection(data, selection)
+        else:
+            f = open(source)
+            try:
+                self.LoadSelection(f, selection, stream)
+            finally:
+                f.close()
+
+    def ParseSelection(self, models, selection):
+        # models() iterates over every model of the export, it is called once for each pass
+        with self.Profiler.Phase('select'):
+            children = {}  # parent ID -> the IDs of the models inside scenes under it
+            outputs = {}  # the output IDs of each model inside a scene
+            snippets = set()
+            for model in models():
+                if InScene(model):
+                    properties = model['Properties']
+                    theID = InternID(properties['Id'])
+                    children.setdefault(InternID(properties['Parent']), []).append(theID)
+                    outputs[theID] = OutputTargets(properties)
+                    if model['Type'] not in SCENE_MODEL_TYPES and FlowFragKind(properties['DisplayName']) == 'snippet':
+                        snippets.add(theID)
+                else:
+                    self.ParseModel(model)
+            self.Selected = SelectModels(self, selection, children, outputs, snippets)
+
+        with self.Profiler.Phase('parse'):
+            for model in models():
+                if InScene(model) and InternID(model['Properties']['Id']) in self.Selected:
+                    self.ParseModel(model)
+
+    def Link(self):
+        """Connect the parsed nodes and link the game, episodes and scenes together"""
+        with self.Profiler.Phase('sort'):
+            self.Characters.sort(key=lambda character: character.Name)
+            self.Episodes.sort(key=lambda episode: episode.Num)
+            self.Scenes.sort(key=lambda scene: scene.Num)
+            self.Snippets.sort(key=lambda snippet: snippet.Num)
+
+        # connect the dialogs and the nodes between them
+
+        with self.Profiler.Phase('dialog connections'):
+            for dialog in self.Dialogs:
+                dialog.MakeConnections(self.Nodes)
+
+        with self.Profiler.Phase('connections'):
+            for clist in [self.Conditions, self.Instructions, self.Codes, self.Snippets, self.Hubs]:
+                for citem in clist:
+                    citem.MakeConnections(self.Nodes)
+
+        # index the children of every node once, in the (sorted) list order, rather than rescanning the lists for each parent
+        with self.Profiler.Phase('index'):
+            episodesByParent = BuildChildIndex(self.Episodes)
+            scenesByParent = BuildChildIndex(self.Scenes)
+            self.DialogsByParent = BuildChildIndex(self.Dialogs, self.Snippets, self.Conditions, self.Instructions, self.Codes)
+
+        # a cycle is kept rather than raised, so that --validate can still list it with the other problems
+        with self.Profiler.Phase('linkages'):
+            problem = self.TheGame.MakeLinkages(episodesByParent)
+            self.LinkProblems = [problem] if problem != None else []
+            # without an order for the episodes, all of them are linked so that their scenes can be validated
+            for episode in FollowNext(self.TheGame.First) if problem == None else self.TheGame.Children:
+                problem = episode.MakeLinkages(scenesByParent)
+                if problem != None:
+                    self.LinkProblems.append(problem)
+
+        if self.Selected != None:
+            # the other scenes were only parsed to link the episodes, they are not generated
+            self.Scenes = [scene for scene in self.Scenes if scene.Frag.ID in self.Selected]
+
+    def Validate(self):
+        """The problems in the linked nodes which would hang or break the generation, see ArticyValidate"""
+        with self.Profiler.Phase('validate'):
+            self.Problems = ValidateProject(self)
+        return self.Problems
+
+    def SaveSnapshot(self, path, fingerprint):
+        if len(self.LinkProblems) > 0:
+            # the snapshot would load without the problems, and generate as if the export were fine
+            return
+        with self.Profiler.Phase('save snapshot'):
+            SaveSnapshot(path, fingerprint, ParserVersion(self.Handlers), self.TheGame, self.Lists())
+
+    def LoadSnapshot(self, path, fingerprint):
+        """Load the linked structures saved from the same JSON file, returns False if there is no such snapshot"""
+        with self.Profiler.Phase('load snapshot'):
+            snapshot = LoadSnapshot(path, fingerprint, ParserVersion(self.Handlers))
+        if snapshot == None:
+            return False
+        self.TheGame, lists = snapshot
+        for name, nodes in lists.items():
+            setattr(self, name, nodes)
+        self.IndexNodes()
+        return True
+
+    def IndexNodes(self):
+        # rebuild the ID registry and the children index from the lists, after they were loaded or pruned
+        self.Nodes = {}
+        for name, nodes in self.Lists().items():
+            for node in nodes:
+                if type(node) == Dialog or type(node) == Character:
+                    self.Nodes[node.ID] = node
+                elif type(node) != FlowFrag:
+                    self.Nodes[node.Frag.ID] = node
+        self.Nodes[self.TheGame.Frag.ID] = self.TheGame
+        self.DialogsByParent = BuildChildIndex(self.Dialogs, self.Snippets, self.Conditions, self.Instructions, self.Codes)
+
+    def Prune(self):
+        """Drop the nodes the game cannot reach (see ArticyPrune), returns {list name: (kept, dropped)}"""
+        self.Prepare()
+        with self.Profiler.Phase('prune'):
+            self.PruneCounts = PruneProject(self)
+        return self.PruneCounts
+
+    def Prepare(self):
+        # find the first node of every scene and snippet, which the generation starts from; only done once
+        if self.Prepared:
+            return
+        if len(self.LinkProblems) > 0:
+            raise Exception(self.LinkProblems[0])
+        with self.Profiler.Phase('prepare dialog'):
+            for scene in self.Scenes+self.Snippets:
+                scene.PrepareDialog(self.DialogsByParent)
+        self.Prepared = True
+
+    def Generate(self, jobs=1, cache=None):
+        """Generate the Ren'Py lines and images of every scene and snippet, kept on each of them
+
+        jobs > 1 shares the generation out to a pool of processes. With a SceneCache, the scenes whose
+        subgraph has not changed are taken from the cache, and the others are stored in it."""
+        self.Prepare()
+
+        pending = self.Scenes+self.Snippets
+        if cache != None:
+            # reuse the lines of every scene whose subgraph has not changed since the last run
+            with self.Profiler.Phase('cache lookup'):
+                hashes = {}
+                hasher = SceneHasher()
+                pending = []
+                for scene in self.Scenes+self.Snippets:
+                    hashes[id(scene)] = hasher.Hash(scene)
+                    if not cache.Lookup(scene, hashes[id(scene)]):
+                        pending.append(scene)
+
+        with self.Profiler.Phase('generate'):
+            if jobs > 1:
+                # the scenes are generated independently of each other, so they can be shared out to other processes
+                nodes = [self.TheGame]
+                for nodelist in self.Lists().values():
+                    nodes.extend(nodelist)
+                seconds = GenerateScenesInParallel(pending, jobs, nodes)
+                for scene, sceneseconds in zip(pending, seconds):
+                    self.Profiler.AddScene(scene, sceneseconds)
+            else:
+                for scene in pending:
+                    start = time.perf_counter()
+                    scene.GenerateRenpyScene()
+                    self.Profiler.AddScene(scene, time.perf_counter()-start)
+
+        if cache != None:
+            for scene in pending:
+                cache.Store(scene, hashes[id(scene)])
+
+    def RenpyChunks(self):
+        """The text of RenpyText, one scene at a time so it can be written without holding all of it in memory"""
+        for scene in self.Scenes+self.Snippets:
+            if len(scene.Lines) > 0:
+                yield "\n".join(scene.Lines)+"\n\n"
+
+        images = []
+        for scene in self.Scenes+self.Snippets:
+            for imagename in scene.Images:
+                images.append(f"{imagename}\n")
+            images.append("\n")
+        yield "".join(images)
+
+    def StreamRenpyChunks(self, chunklines=STREAM_CHUNK_LINES):
+        """The text of RenpyText, generating each scene as it is written instead of using the lines kept by Generate
+
+        Only chunklines lines of a scene are held at a time, so the memory used stays flat however long a scene is.
+        The lines are not kept on the scenes; their Images are, once the scene has been written.
+        Only the time spent generating is profiled, as a 'generate' phase and per scene, not the time the caller takes over each chunk."""
+        self.Prepare()
+        stopwatch = Stopwatch()
+        for scene in self.Scenes+self.Snippets:
+            sceneseconds = stopwatch.Wall
+            stopwatch.Start()
+            lines = []
+            for line in scene.IterRenpyScene():
+                lines.append(line)
+                if len(lines) >= chunklines:
+                    chunk = "\n".join(lines)+"\n"
+                    lines.clear()
+                    stopwatch.Stop()
+                    yield chunk
+                    stopwatch.Start()
+            lines.append("\n")
+            chunk = "\n".join(lines)
+            stopwatch.Stop()
+            self.Profiler.AddScene(scene, stopwatch.Wall-sceneseconds)
+            yield chunk
+        self.Profiler.AddPhase('generate', stopwatch)
+
+        images = []
+        for scene in self.Scenes+self.Snippets:
+            for imagename in scene.Images:
+                images.append(f"{imagename}\n")
+            images.append("\n")
+        yield "".join(images)
+
+    def RenpyText(self):
+        """The generated Ren'Py of every scene then every snippet, followed by the images each of them needs"""
+        return "".join(self.RenpyChunks())
+
+    def ImageManifest(self):
+        """The images needed by each scene and snippet, by prefix"""
+        manifest = {}
+        for scene in self.Scenes+self.Snippets:
+            manifest[scene.Prefix()] = list(scene.Images)
+        return manifest
+
+    def Images(self):
+        """Every image needed by the project once, in the order the scenes and snippets first use them"""
+        return UniqueImages(self.Scenes+self.Snippets)
+
+# --------------------------------------
+
+def Convert(source, stream=False, jobs=1, cache=None, snapshot=None, profiler=None, selection=None, validate=False, prune=False, generate=True):
+    """Convert an Articy export to Ren'Py in memory, returning the ArticyProject holding the result
+
+    source is a path, an open file or the already loaded JSON. The generated lines and images are kept on
+    each of the project's Scenes and Snippets; RenpyText() and ImageManifest() collect them.
+    cache is an optional SceneCache, snapshot an optional snapshot path (only used when source is a path),
+    profiler an optional ArticyProfile.Profiler to record the time taken by each phase. selection is an optional
+    ArticySelect.Selection of the episodes, scenes and snippets to convert, the snapshot is not used with it.
+    validate keeps the problems found on the project's Problems, raising a ValidationError if any are errors;
+    prune keeps the counts of the nodes dropped on its PruneCounts. generate=False stops once the project is
+    linked, validated and pruned, for a caller which generates the scenes itself (StreamRenpyChunks, Generate)."""
+    project = ArticyProject(profiler)
+    if selection != None:
+        # a snapshot holds the whole export, so it is neither loaded nor saved for a selection
+        project.LoadSelection(source, selection, stream)
+        project.Link()
+    else:
+        loaded = False
+        if snapshot != None and isinstance(source, (str, os.PathLike)):
+            fingerprint = Fingerprint(source)
+            loaded = project.LoadSnapshot(snapshot, fingerprint)
+        if not loaded:
+            project.Load(source, stream)
+            project.Link()
+            if snapshot != None and isinstance(source, (str, os.PathLike)):
+                project.SaveSnapshot(snapshot, fingerprint)
+
+    # validated before pruning, which needs the flow of every scene to be free of cycles
+    if validate and CountErrors(project.Validate()) > 0:
+        raise ValidationError(project.Problems)
+    if prune:
+        project.Prune()
+    if generate:
+        project.Generate(jobs, cache)
+    return project
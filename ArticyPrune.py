@@ -0,0 +1,55 @@
+from ArticyCoreClass import Snippet
+from ArticyCoreClass import FollowNext
+
+# the lists of an ArticyProject which are pruned, in the order they are reported
+PRUNED_LISTS = ('Episodes', 'Scenes', 'Snippets', 'Dialogs', 'Conditions', 'Instructions', 'Codes', 'Hubs')
+
+# --------------------------------------
+
+def FindReachable(game):
+    """The ids of every node reachable from the game: its episodes and their scenes in order, then the flow of each scene
+
+    The scenes and snippets must have been prepared (PrepareDialog), so their First is set. Snippets are reached
+    from the scenes which call them, and their own flow is followed from their First."""
+    reachable = {id(game)}
+    pending = []
+    for episode in FollowNext(game.First):
+        reachable.add(id(episode))
+        for scene in FollowNext(episode.First):
+            reachable.add(id(scene))
+            pending.append(scene.First)
+
+    while len(pending) > 0:
+        node = pending.pop()
+        if node == None or id(node) in reachable:
+            continue
+        reachable.add(id(node))
+        if type(node) == Snippet:
+            pending.append(node.First)
+        pending.extend(node.Outputs)
+    return reachable
+
+def PruneProject(project):
+    """Drop every node the game cannot reach from a prepared ArticyProject, returns {list name: (kept, dropped)}
+
+    The kept nodes are not changed, apart from their Children losing the dropped nodes, so the Ren'Py generated
+    for them is the same as without pruning. Their Inputs still name any dropped node which leads into them."""
+    reachable = FindReachable(project.TheGame)
+
+    counts = {}
+    for name in PRUNED_LISTS:
+        nodes = getattr(project, name)
+        kept = [node for node in nodes if id(node) in reachable]
+        counts[name] = (len(kept), len(nodes)-len(kept))
+        setattr(project, name, kept)
+
+    for node in [project.TheGame]+project.Episodes+project.Scenes+project.Snippets:
+        if len(node.Children) > 0:
+            node.Children = [child for child in node.Children if id(child) in reachable]
+
+    # the flow fragments behind the dropped episodes, scenes, snippets and code blocks go with them
+    keptfrags = set(id(node.Frag) for node in [project.TheGame]+project.Episodes+project.Scenes+project.Snippets+project.Codes)
+    project.FlowFrags = [frag for frag in project.FlowFrags if id(frag) in keptfrags]
+
+    project.IndexNodes()
+    return counts
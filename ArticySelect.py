@@ -0,0 +1,71 @@
+from ArticyCoreClass import Episode
+from ArticyCoreClass import Scene
+from ArticyCoreClass import InternID
+
+# --------------------------------------
+
+class Selection:
+    """The parts of an export to convert: episodes by number, scenes by prefix (ep3sc05), and episodes, scenes or snippets by Articy ID"""
+
+    def __init__(self, episodes: [] = None, scenes: [] = None, ids: [] = None):
+        self.Episodes = episodes if episodes != None else []
+        self.Scenes = scenes if scenes != None else []
+        self.IDs = ids if ids != None else []
+
+# --------------------------------------
+
+def SelectedRoots(project, selection: Selection, snippets: set):
+    # the IDs of the scenes and snippets picked by the selection, project has its game, episodes and scenes parsed
+    roots = []
+    episodesByID = {}
+    for episode in project.Episodes:
+        episodesByID[episode.Frag.ID] = episode
+
+    for num in selection.Episodes:
+        episodes = [episode for episode in project.Episodes if episode.Num == num]
+        if len(episodes) == 0:
+            raise Exception(f"There is no episode {num} in the export")
+        for episode in episodes:
+            roots.extend(scene.Frag.ID for scene in project.Scenes if scene.Frag.ParentID == episode.Frag.ID)
+
+    for prefix in selection.Scenes:
+        found = False
+        for scene in project.Scenes:
+            # the prefix the scene has once linked, its parent is only set for the comparison
+            scene.Parent = episodesByID.get(scene.Frag.ParentID)
+            if scene.Prefix() == prefix:
+                roots.append(scene.Frag.ID)
+                found = True
+            scene.Parent = None
+        if not found:
+            raise Exception(f"There is no scene {prefix} in the export")
+
+    for articyid in selection.IDs:
+        theID = InternID(articyid)
+        node = project.Nodes.get(theID)
+        if type(node) == Episode:
+            roots.extend(scene.Frag.ID for scene in project.Scenes if scene.Frag.ParentID == theID)
+        elif type(node) == Scene or theID in snippets:
+            roots.append(theID)
+        else:
+            raise Exception(f"{articyid} is not an episode, scene or snippet in the export")
+
+    return roots
+
+def SelectModels(project, selection: Selection, children: {}, outputs: {}, snippets: set):
+    """The IDs of the selected scenes and snippets, every model inside them, and the snippets they call with what is inside those
+
+    children maps each parent ID to the IDs of the models inside scenes under it, outputs maps each of those models
+    to its output IDs, and snippets holds the IDs of the snippets among them."""
+    selected = set()
+    pending = SelectedRoots(project, selection, snippets)
+    while len(pending) > 0:
+        theID = pending.pop()
+        if theID in selected:
+            continue
+        selected.add(theID)
+        pending.extend(children.get(theID, []))
+        for outputid in outputs.get(theID, []):
+            if outputid in snippets:
+                pending.append(outputid)
+    return selected
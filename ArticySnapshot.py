@@ -0,0 +1,77 @@
+import gc
+import hashlib
+import os
+import pickle
+
+from ArticyCoreClass import ARTICY_IDS
+from ArticyCache import GeneratorVersion
+from ArticyGraph import PackNodes
+from ArticyGraph import UnpackNodes
+
+# bump when the snapshot layout changes; changes to ArticyCoreClass, and to the parsing (see ArticyProject.ParserVersion),
+# invalidate snapshots by themselves
+SNAPSHOT_VERSION = 3
+
+# --------------------------------------
+
+def Fingerprint(path):
+    """The size, modification time and SHA-256 of the JSON file a snapshot is taken from"""
+    stat = os.stat(path)
+    sha = hashlib.sha256()
+    f = open(path, 'rb')
+    chunk = f.read(1 << 20)
+    while len(chunk) > 0:
+        sha.update(chunk)
+        chunk = f.read(1 << 20)
+    f.close()
+    return (stat.st_size, stat.st_mtime_ns, sha.hexdigest())
+
+def SaveSnapshot(path, fingerprint, parserversion, game, lists: {}):
+    """Save the linked game and the named node lists, with every link between nodes stored as an index
+
+    parserversion identifies how the export was parsed, a snapshot is only loaded back by the same parsing."""
+    nodes = [game]
+    for name, nodelist in lists.items():
+        nodes.extend(nodelist)
+    packed = PackNodes(nodes)
+
+    # each list is saved as the positions of its nodes in the packed records
+    positions = {}
+    start = 1
+    for name, nodelist in lists.items():
+        positions[name] = (start, len(nodelist))
+        start += len(nodelist)
+
+    # the header is a separate pickle, so a stale snapshot is rejected without reading the rest
+    header = (SNAPSHOT_VERSION, GeneratorVersion(), parserversion, fingerprint)
+    f = open(path+".tmp", 'wb')
+    pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+    # with the Articy IDs which cannot be written back from their integers, so the debug output names them the same
+    pickle.dump((positions, packed, ARTICY_IDS), f, protocol=pickle.HIGHEST_PROTOCOL)
+    f.close()
+    os.replace(path+".tmp", path)
+
+def LoadSnapshot(path, fingerprint, parserversion):
+    """Load a snapshot saved by SaveSnapshot, returns (game, lists) or None if it is missing or was taken from a different file"""
+    if not os.path.exists(path):
+        return None
+    f = open(path, 'rb')
+    # the collector would otherwise keep rescanning the nodes while they are being created
+    gc.disable()
+    try:
+        header = pickle.load(f)
+        if header != (SNAPSHOT_VERSION, GeneratorVersion(), parserversion, fingerprint):
+            return None
+        positions, packed, articyids = pickle.load(f)
+        nodes = UnpackNodes(packed)
+    except (pickle.UnpicklingError, EOFError, ValueError):
+        return None
+    finally:
+        gc.enable()
+        f.close()
+
+    ARTICY_IDS.update(articyids)
+    lists = {}
+    for name, (start, count) in positions.items():
+        lists[name] = nodes[start:start+count]
+    return (nodes[0], lists)
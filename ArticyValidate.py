@@ -0,0 +1,108 @@
+from ArticyCoreClass import Dialog
+from ArticyCoreClass import Condition
+from ArticyCoreClass import Snippet
+from ArticyCoreClass import ArticyID
+
+# problems which stop the Ren'Py being generated, and those which only lose part of it
+ERROR = 'error'
+WARNING = 'warning'
+
+# --------------------------------------
+
+class ValidationError(Exception):
+    """Raised when the validation finds errors, Problems holds everything it found"""
+
+    def __init__(self, problems: []):
+        super().__init__(f"{CountErrors(problems)} errors found by the validation")
+        self.Problems = problems
+
+def CountErrors(problems: []):
+    return sum(1 for severity, message in problems if severity == ERROR)
+
+# --------------------------------------
+
+def Describe(node):
+    # a short name for a node in a report
+    if type(node) == Dialog:
+        text = node.Text.split("\n")[0]
+        if len(text) > 40:
+            text = text[:37]+"..."
+        return f"dialog {ArticyID(node.ID)} \"{text}\""
+    return f"{type(node).__name__.lower()} {ArticyID(node.Frag.ID)} {node.Desc}".rstrip()
+
+def OutputTargets(node):
+    # the output IDs which MakeConnections turned into the node's Outputs, the output back to the parent is skipped there
+    if type(node) == Dialog:
+        return [outputid for outputid in node.OutputIDs if outputid != node.ParentID]
+    return [outputid for outputid in node.Frag.OutputIDs if outputid != node.Frag.ParentID]
+
+def FindCycles(nodes: []):
+    """Each cycle through the Outputs of nodes, as the list of nodes around it, found with one depth first search"""
+    cycles = []
+    state = {}  # id(node) -> 1 while the node is on the current path, 2 once everything after it has been searched
+    for root in nodes:
+        if id(root) in state:
+            continue
+        path = [root]
+        pending = [iter(root.Outputs)]
+        state[id(root)] = 1
+        while len(pending) > 0:
+            node = next(pending[-1], pending)
+            if node is pending:
+                # every output of the node at the end of the path has been searched
+                state[id(path.pop())] = 2
+                pending.pop()
+            elif node == None:
+                continue
+            elif id(node) not in state:
+                state[id(node)] = 1
+                path.append(node)
+                pending.append(iter(node.Outputs))
+            elif state[id(node)] == 1:
+                cycles.append(path[path.index(node):])
+    return cycles
+
+def ValidateProject(project):
+    """Check a linked ArticyProject for the problems which hang or break the generation, in time linear in its nodes and links
+
+    Returns a list of (ERROR or WARNING, message)."""
+    problems = []
+    flownodes = project.Dialogs+project.Conditions+project.Instructions+project.Codes+project.Snippets+project.Hubs
+
+    for node in flownodes:
+        # the outputs of a condition are its true and false paths, several outputs of anything else are the items of a menu,
+        # or when they are not all dialogs, snippets which are each called
+        calls = len(node.Outputs) > 1 and type(node) != Condition and any(type(output) != Dialog for output in node.Outputs)
+
+        # MakeConnections keeps a None in Outputs for each target which is not a dialog, condition, instruction, code block, snippet or hub
+        if None in node.Outputs and not calls:
+            for outputid, output in zip(OutputTargets(node), node.Outputs):
+                if output == None:
+                    problems.append((WARNING, f"{Describe(node)} has an output to {ArticyID(outputid)}, which is not a node a scene can contain"))
+
+        if calls:
+            for outputid, output in zip(OutputTargets(node), node.Outputs):
+                if type(output) != Snippet:
+                    target = Describe(output) if output != None else ArticyID(outputid)
+                    problems.append((ERROR, f"{Describe(node)} calls each of its outputs, as they are not all dialogs, but its output {target} is not a snippet"))
+        elif len(node.Outputs) > 1 and type(node) != Condition:
+            for output in node.Outputs:
+                if len(output.MenuText) == 0:
+                    problems.append((ERROR, f"{Describe(node)} leads to a menu, but its output {Describe(output)} has no MenuText"))
+
+    for dialog in project.Dialogs:
+        if dialog.Parent == None:
+            problems.append((WARNING, f"{Describe(dialog)} is not in a scene or snippet"))
+
+    for scene in project.Scenes:
+        if scene.Parent == None:
+            problems.append((WARNING, f"{Describe(scene)} is not in an episode"))
+
+    for episode in project.Episodes:
+        if episode.Parent == None:
+            problems.append((WARNING, f"{Describe(episode)} is not in the game"))
+
+    for cycle in FindCycles(flownodes+project.Scenes+project.Episodes):
+        problems.append((ERROR, "cycle: "+" -> ".join(Describe(node) for node in cycle+cycle[:1])))
+
+    return problems
@@ -0,0 +1,59 @@
+import os
+import time
+import traceback
+
+# seconds between checks of the watched file
+POLL_INTERVAL = 0.2
+
+# seconds the file must stay the same before it is converted, so an export still being written is not read
+DEBOUNCE_TIME = 0.2
+
+# --------------------------------------
+
+def FileState(path):
+    # the size and modification time of the file, None while it does not exist (some tools delete and recreate it)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+def WaitUntilSettled(path, state, debounce):
+    """Wait until the file has kept the same size and modification time for debounce seconds, returns that state"""
+    while True:
+        time.sleep(debounce)
+        settled = FileState(path)
+        if settled == state and settled != None:
+            return settled
+        state = settled
+
+def ConvertAndReport(path, convert):
+    # one conversion, an error is reported rather than stopping the watch
+    start = time.perf_counter()
+    try:
+        convert()
+    except Exception:
+        traceback.print_exc()
+        print(f"{time.strftime('%H:%M:%S')}: {path} could not be converted, waiting for the next change")
+        return
+    print(f"{time.strftime('%H:%M:%S')}: {path} converted in {time.perf_counter()-start:.2f}s")
+
+def WatchFile(path, convert, interval=POLL_INTERVAL, debounce=DEBOUNCE_TIME):
+    """Call convert() straight away, then each time the file at path changes, until interrupted with Ctrl+C
+
+    The file is polled every interval seconds, and only converted once it has settled. An error in a
+    conversion, the first one included, is reported and the watch carries on, the next change may well fix it."""
+    print(f"Watching {path}, press Ctrl+C to stop")
+    state = FileState(path)
+    try:
+        ConvertAndReport(path, convert)
+        while True:
+            time.sleep(interval)
+            current = FileState(path)
+            if current == state:
+                continue
+
+            state = WaitUntilSettled(path, current, debounce)
+            ConvertAndReport(path, convert)
+    except KeyboardInterrupt:
+        print()